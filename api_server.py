@@ -1,138 +1,536 @@
-from flask import Flask, jsonify, request
-import json
+from flask import Flask, jsonify, request, make_response
+from flask.json.provider import DefaultJSONProvider
 import sqlite3
 import pandas as pd
 import os
+import gzip
+import hashlib
+import functools
+import heapq
+import bisect
+import itertools
+import multiprocessing
+from datetime import datetime, timedelta, timezone
+from urllib.parse import urlencode
+import storage
+import retention
+import article
+import trends
+
+class FastJSONProvider(DefaultJSONProvider):
+    """JSON provider encoding responses with orjson"""
+    def dumps(self, obj, **kwargs):
+        # orjson supports sorted keys, 2-space indentation and compact output;
+        # any other option is left to the standard encoder
+        options = dict(kwargs)
+        indent = options.pop("indent", None)
+        sort_keys = options.pop("sort_keys", self.sort_keys)
+        separators = options.pop("separators", None)
+        if options or indent not in (None, 2) or separators not in (None, (",", ":")):
+            return super().dumps(obj, **kwargs)
+        return article.dumps(obj, indent=bool(indent), sort_keys=sort_keys)
 
 app = Flask(__name__)
+if article.orjson is not None:
+    app.json = FastJSONProvider(app)
+
+# Responses smaller than this are not worth the CPU cost of compressing
+COMPRESS_MIN_SIZE = 500
+COMPRESS_LEVEL = 5
+
+# How long clients and proxies may reuse a response without revalidating
+CACHE_MAX_AGE = int(os.environ.get('API_CACHE_MAX_AGE', 0))
+
+# Files backing each data format, in the order the API prefers them.
+# In WAL mode new rows land in the -wal file before they reach the main file.
+# Sharded storage rewrites its manifest on every ingest.
+DATA_FILES = [
+    (storage.manifest_path(),),
+    ('news_data.db', 'news_data.db-wal'),
+    ('data/news_data.json',),
+    ('data/news_data.csv',),
+]
+REPORT_FILES = [('data/report.json',)]
+
+# Article fields the API can return. Full article content is large, so list
+# responses only include it when it is requested with fields=.
+ARTICLE_FIELDS = ('id',) + storage.ARTICLE_COLUMNS
+DEFAULT_FIELDS = tuple(field for field in ARTICLE_FIELDS if field != 'content')
+
+# Fields that accept lists of values on /api/news and can be counted as facets
+FACET_FIELDS = ('country', 'source', 'language')
 
-def get_db_connection():
-    """Create a connection to the SQLite database"""
-    conn = sqlite3.connect('news_data.db')
+# Parsed JSON/CSV data kept per worker process, keyed by file path
+_data_cache = {}
+
+def get_db_connection(db_file='news_data.db'):
+    """Create a read-only connection to the SQLite database"""
+    conn = sqlite3.connect(f'file:{db_file}?mode=ro', uri=True)
     conn.row_factory = sqlite3.Row
     return conn
 
+def load_shard_manifest():
+    """Get the shard manifest if the database is sharded, otherwise None"""
+    path = storage.manifest_path()
+    if not os.path.exists(path):
+        return None
+    return _load_cached(path, _read_json)
+
+def get_db_files(manifest, countries=None, since=None, until=None):
+    """Get the database files to query, routing to the relevant shards when sharded"""
+    if manifest is None:
+        return ['news_data.db']
+    return storage.shard_paths(manifest, countries=countries, since=since, until=until)
+
+def parse_list_arg(name):
+    """Get a query parameter given as a comma-separated list (or repeated) as a list of values"""
+    values = []
+    for value in request.args.getlist(name):
+        values.extend(part.strip() for part in value.split(',') if part.strip())
+    return values
+
+def shift_date(value, days):
+    """Move the date of an ISO date bound by a number of days (None if it is not a date)"""
+    try:
+        return (datetime.strptime(value[:10], "%Y-%m-%d") + timedelta(days=days)).strftime("%Y-%m-%d")
+    except (TypeError, ValueError):
+        return None
+
+def until_bound(until):
+    """Make a date-only upper bound include the whole day"""
+    if until and len(until) == 10:
+        # "~" sorts after every time of day, with or without fractions or a zone suffix
+        return until + "T~"
+    return until
+
+def fetch_articles(db_file, query, params):
+    """Run an article query on one database, decompressing stored text fields"""
+    conn = get_db_connection(db_file)
+    # Stored dictionaries never change, so they are loaded once per database file version
+    codec = storage.TextCodec(conn, _load_cached(db_file, lambda path: {}, 'dictionaries'))
+    rows = [codec.decode_article(dict(row)) for row in conn.execute(query, params).fetchall()]
+    conn.close()
+    return rows
+
+def query_sorted(db_files, query, params, limit, offset):
+    """
+    Run a query ordered by publication date DESC over one or more databases.
+    
+    The query must end with "LIMIT ? OFFSET ?". Each shard returns its first
+    offset + limit rows, which are merged into a single sorted page.
+    """
+    if len(db_files) == 1:
+        return fetch_articles(db_files[0], query, params + [limit, offset])
+    
+    shard_rows = [fetch_articles(db_file, query, params + [offset + limit, 0]) for db_file in db_files]
+    
+    merged = heapq.merge(*shard_rows, key=lambda row: row['publication_date'], reverse=True)
+    return list(itertools.islice(merged, offset, offset + limit))
+
+def query_counts(db_files, query, params, key_fields):
+    """Run a GROUP BY count query over one or more databases and add up the counts"""
+    counts = {}
+    for db_file in db_files:
+        conn = get_db_connection(db_file)
+        for row in conn.execute(query, params).fetchall():
+            key = tuple(row[field] for field in key_fields)
+            counts[key] = counts.get(key, 0) + row["count"]
+        conn.close()
+    return counts
+
+def missing_table(db_files, table):
+    """Whether any of the databases lacks a table that the scraper adds when it migrates the schema"""
+    for db_file in db_files:
+        conn = get_db_connection(db_file)
+        row = conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (table,)).fetchone()
+        conn.close()
+        if row is None:
+            return True
+    return False
+
+def schema_not_migrated(feature):
+    """Error response for a query needing tables that an older database does not have yet"""
+    return jsonify({"error": f"The database has no {feature} yet. Run the scraper once to migrate it."}), 503
+
+def _load_cached(path, loader, name=None):
+    """
+    Load a data file once per worker and reload it when the scraper replaces it.
+    
+    The scraper publishes new data by atomically renaming a fresh file into place,
+    so a changed modification time or size means a new version is available.
+    Several structures can be derived from the same file by giving them a name.
+    """
+    stat = os.stat(path)
+    version = (stat.st_mtime_ns, stat.st_size)
+    cached = _data_cache.get((path, name))
+    
+    if cached is None or cached[0] != version:
+        cached = (version, loader(path))
+        _data_cache[(path, name)] = cached
+    
+    return cached[1]
+
+def _read_json(path):
+    """Read a JSON data file"""
+    with open(path, 'rb') as file:
+        return article.loads(file.read())
+
+def load_json_data():
+    """Get the articles from the JSON data file (shared, do not modify)"""
+    return _load_cached('data/news_data.json', _read_json)
+
+def load_csv_data():
+    """Get the articles from the CSV data file (shared, do not modify)"""
+    return _load_cached('data/news_data.csv', pd.read_csv)
+
+def _build_tag_counts(articles):
+    """
+    Count tag usage over articles loaded from a JSON or CSV file.
+    
+    Returns:
+        dict: (country, source, tag) -> number of articles
+    """
+    counts = {}
+    for item in articles:
+        for tag in storage.normalize_tags(item['keywords']):
+            key = (item['country'], item['source'], tag)
+            counts[key] = counts.get(key, 0) + 1
+    return counts
+
+def load_json_tag_counts():
+    """Get the tag counts of the JSON data file"""
+    return _load_cached('data/news_data.json', lambda path: _build_tag_counts(load_json_data()), 'tags')
+
+def load_csv_tag_counts():
+    """Get the tag counts of the CSV data file"""
+    def build(path):
+        return _build_tag_counts(load_csv_data()[['country', 'source', 'keywords']].to_dict('records'))
+    return _load_cached('data/news_data.csv', build, 'tags')
+
+def _date_key(value):
+    """Publication date as a sortable string (CSV files can hold missing values)"""
+    return value if isinstance(value, str) else ""
+
+def _bitmap(positions, size):
+    """Turn article positions into a bitmap integer"""
+    bits = bytearray((size + 7) // 8)
+    for position in positions:
+        bits[position >> 3] |= 1 << (position & 7)
+    return int.from_bytes(bits, 'little')
+
+def _bitmap_positions(bitmap, size):
+    """Yield the set positions of a bitmap integer in ascending order"""
+    for byte_index, byte in enumerate(bitmap.to_bytes((size + 7) // 8, 'little')):
+        while byte:
+            low = byte & -byte
+            yield byte_index * 8 + low.bit_length() - 1
+            byte ^= low
+
+def _popcount(bitmap):
+    """Number of set bits (int.bit_count needs Python 3.10)"""
+    if hasattr(bitmap, "bit_count"):
+        return bitmap.bit_count()
+    return bin(bitmap).count("1")
+
+def _build_filter_index(articles):
+    """
+    Build bitmap indexes over articles loaded from a JSON or CSV file.
+    
+    Articles are ordered newest first and bit i of every bitmap stands for the
+    i-th article. Filters then combine with | and &, a date range is a
+    contiguous run of bits, facet counts are popcounts, and the set bits of the
+    final bitmap are already in result order. Tags have too many distinct values
+    for a bitmap each, so they keep position lists.
+    """
+    ordered = sorted(articles, key=lambda item: _date_key(item['publication_date']), reverse=True)
+    size = len(ordered)
+    
+    positions = {field: {} for field in FACET_FIELDS}
+    tags = {}
+    for position, item in enumerate(ordered):
+        for field in FACET_FIELDS:
+            positions[field].setdefault(item[field], []).append(position)
+        for tag in storage.normalize_tags(item['keywords']):
+            tags.setdefault(tag, []).append(position)
+    
+    return {
+        "articles": ordered,
+        "dates": [_date_key(item['publication_date']) for item in reversed(ordered)],
+        "bitmaps": {field: {value: _bitmap(value_positions, size) for value, value_positions in values.items()}
+                    for field, values in positions.items()},
+        "tags": tags,
+    }
+
+def load_json_filter_index():
+    """Get the bitmap index of the JSON data file"""
+    return _load_cached('data/news_data.json', lambda path: _build_filter_index(load_json_data()), 'filters')
+
+def load_csv_filter_index():
+    """Get the bitmap index of the CSV data file"""
+    return _load_cached('data/news_data.csv',
+                        lambda path: _build_filter_index(load_csv_data().to_dict('records')), 'filters')
+
+def query_filter_index(index, filters, since, until, tag, facets, limit, offset):
+    """
+    Filter articles through a bitmap index, computing facet counts from the same bitmap.
+    
+    Returns:
+        tuple: (page of articles newest first, {facet field: {value: count}})
+    """
+    articles = index["articles"]
+    size = len(articles)
+    selected = (1 << size) - 1
+    
+    for field, values in filters.items():
+        if values:
+            field_bitmap = 0
+            for value in values:
+                field_bitmap |= index["bitmaps"][field].get(value, 0)
+            selected &= field_bitmap
+    
+    if since or until:
+        # "dates" is ascending while positions are newest first
+        dates = index["dates"]
+        start = size - bisect.bisect_right(dates, until) if until else 0
+        end = size - bisect.bisect_left(dates, since) if since else size
+        selected &= ((1 << end) - 1) ^ ((1 << start) - 1) if end > start else 0
+    
+    if tag:
+        selected &= _bitmap(index["tags"].get(tag, []), size)
+    
+    facet_counts = {}
+    for field in facets:
+        facet_counts[field] = {}
+        for value, bitmap in index["bitmaps"][field].items():
+            count = _popcount(selected & bitmap)
+            if count:
+                facet_counts[field][value] = count
+    
+    page = itertools.islice(_bitmap_positions(selected, size), offset, offset + limit)
+    return [articles[position] for position in page], facet_counts
+
+def _data_version(file_groups):
+    """
+    Get the version of the data currently being served.
+    
+    Args:
+        file_groups (list): Tuples of files, the first existing group is the active one
+        
+    Returns:
+        tuple: (version string, last modified datetime) or None if no data exists
+    """
+    for files in file_groups:
+        if not os.path.exists(files[0]):
+            continue
+        
+        stats = [(path, os.stat(path)) for path in files if os.path.exists(path)]
+        # Readers create an empty WAL file when they first open the database, which changes nothing
+        stats = [(path, stat) for index, (path, stat) in enumerate(stats) if index == 0 or stat.st_size]
+        version = "|".join(f"{path}:{stat.st_mtime_ns}:{stat.st_size}" for path, stat in stats)
+        last_ingest = max(stat.st_mtime for path, stat in stats)
+        last_modified = datetime.fromtimestamp(int(last_ingest), tz=timezone.utc)
+        return version, last_modified
+    
+    return None
+
+def conditional(file_groups):
+    """
+    Decorator adding ETag/Last-Modified validators to an endpoint.
+    
+    The ETag is derived from the data version plus the request path and query,
+    so a matching If-None-Match (or a fresh If-Modified-Since) is answered with
+    304 Not Modified before the view runs any query.
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            data_version = _data_version(file_groups)
+            if data_version is None:
+                return view(*args, **kwargs)
+            
+            version, last_modified = data_version
+            # Encoded so values containing "&" or "=" cannot collide with other queries
+            query = urlencode(sorted(request.args.items(multi=True)))
+            etag = hashlib.sha1(f"{version}|{request.path}?{query}".encode('utf-8')).hexdigest()
+            
+            if request.if_none_match:
+                not_modified = request.if_none_match.contains_weak(etag)
+            else:
+                not_modified = (request.if_modified_since is not None
+                                and last_modified <= request.if_modified_since)
+            
+            if not_modified:
+                response = app.response_class(status=304)
+            else:
+                response = make_response(view(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+            
+            response.set_etag(etag, weak=True)
+            response.last_modified = last_modified
+            response.cache_control.public = True
+            response.cache_control.max_age = CACHE_MAX_AGE
+            return response
+        return wrapper
+    return decorator
+
+@app.after_request
+def add_http_optimizations(response):
+    """Add gzip compression to JSON responses (validators come from @conditional)"""
+    if (request.method not in ('GET', 'HEAD') or response.status_code != 200
+            or response.mimetype != 'application/json' or response.direct_passthrough):
+        return response
+    
+    if 'gzip' in request.accept_encodings:
+        data = response.get_data()
+        if len(data) >= COMPRESS_MIN_SIZE:
+            response.set_data(gzip.compress(data, compresslevel=COMPRESS_LEVEL))
+            response.headers['Content-Encoding'] = 'gzip'
+    
+    response.vary.add('Accept-Encoding')
+    return response
+
 @app.route('/api/news', methods=['GET'])
+@conditional(DATA_FILES)
 def get_news():
-    """Get all news articles with optional filtering"""
-    # Get query parameters
-    country = request.args.get('country')
-    source = request.args.get('source')
-    language = request.args.get('language')
-    since = request.args.get('since')  # Date filter
+    """Get news articles with optional filtering and facet counts"""
+    # Get query parameters; country, source and language accept comma-separated lists
+    filters = {field: parse_list_arg(field) for field in FACET_FIELDS}
+    since = request.args.get('since')  # Date filters
+    until = until_bound(request.args.get('until'))
+    tag = request.args.get('tag')
     limit = request.args.get('limit', default=100, type=int)
     offset = request.args.get('offset', default=0, type=int)
+    include_archive = request.args.get('include_archive', '').lower() in ('1', 'true', 'yes')
+    fields = request.args.get('fields')
+    facets = list(dict.fromkeys(parse_list_arg('facets')))  # Deduplicated, in request order
+    
+    if limit is None or offset is None or limit < 0 or offset < 0:
+        return jsonify({"error": "limit and offset must be non-negative integers"}), 400
+    
+    fields = fields.split(',') if fields else list(DEFAULT_FIELDS)
+    unknown_fields = [field for field in fields if field not in ARTICLE_FIELDS]
+    if unknown_fields:
+        return jsonify({"error": f"Unknown fields: {', '.join(unknown_fields)}"}), 400
+    
+    if any(field not in FACET_FIELDS for field in facets):
+        return jsonify({"error": f"facets must be among: {', '.join(FACET_FIELDS)}"}), 400
+    
+    if tag:
+        tag = storage.normalize_tag(tag)
+    
+    # With archives the page is cut after merging, so fetch everything up to its end
+    page_limit, page_offset = (offset + limit, 0) if include_archive else (limit, offset)
+    facet_counts = {field: {} for field in facets}
     
     # Load data based on format
-    if os.path.exists('news_data.db'):
-        # Use SQLite database
-        conn = get_db_connection()
-        cursor = conn.cursor()
+    manifest = load_shard_manifest()
+    if manifest is not None or os.path.exists('news_data.db'):
+        # Use SQLite database, or only the shards that can match the filters
+        db_files = get_db_files(manifest, countries=filters['country'], since=since, until=until)
         
-        # Build query
-        query = "SELECT * FROM news_articles WHERE 1=1"
-        params = []
+        if tag and missing_table(db_files, 'article_tags'):
+            return schema_not_migrated("tag index")
         
-        if country:
-            query += " AND country = ?"
-            params.append(country)
-        
-        if source:
-            query += " AND source = ?"
-            params.append(source)
+        # Build the filter shared by the result page and the facet counts
+        where = "1=1"
+        params = []
         
-        if language:
-            query += " AND language = ?"
-            params.append(language)
+        for field, values in filters.items():
+            if values:
+                where += f" AND {field} IN ({', '.join('?' for _ in values)})"
+                params.extend(values)
         
         if since:
-            query += " AND publication_date >= ?"
+            where += " AND publication_date >= ?"
             params.append(since)
         
-        query += " ORDER BY publication_date DESC LIMIT ? OFFSET ?"
-        params.extend([limit, offset])
+        if until:
+            where += " AND publication_date <= ?"
+            params.append(until)
         
-        # Execute query
-        cursor.execute(query, params)
-        results = [dict(row) for row in cursor.fetchall()]
+        if tag:
+            # Resolved through the tag index instead of scanning keywords
+            where += (" AND id IN (SELECT article_tags.article_id FROM article_tags"
+                      " JOIN tags ON tags.id = article_tags.tag_id WHERE tags.name = ?)")
+            params.append(tag)
         
-        conn.close()
+        # Load only the requested columns (results are merged by date)
+        columns = fields if 'publication_date' in fields else fields + ['publication_date']
+        query = f"SELECT {', '.join(columns)} FROM news_articles WHERE {where} ORDER BY publication_date DESC LIMIT ? OFFSET ?"
         
-    elif os.path.exists('data/news_data.json'):
-        # Use JSON file
-        with open('data/news_data.json', 'r', encoding='utf-8') as file:
-            all_news = json.load(file)
-        
-        # Filter results
-        results = all_news
-        
-        if country:
-            results = [item for item in results if item['country'] == country]
-        
-        if source:
-            results = [item for item in results if item['source'] == source]
-        
-        if language:
-            results = [item for item in results if item['language'] == language]
-        
-        if since:
-            results = [item for item in results if item['publication_date'] >= since]
-        
-        # Sort by publication date (descending)
-        results.sort(key=lambda x: x['publication_date'], reverse=True)
-        
-        # Apply limit and offset
-        results = results[offset:offset+limit]
-        
-    elif os.path.exists('data/news_data.csv'):
-        # Use CSV file
-        df = pd.read_csv('data/news_data.csv')
-        
-        # Apply filters
-        if country:
-            df = df[df['country'] == country]
-        
-        if source:
-            df = df[df['source'] == source]
-        
-        if language:
-            df = df[df['language'] == language]
-        
-        if since:
-            df = df[df['publication_date'] >= since]
-        
-        # Sort by publication date
-        df = df.sort_values(by='publication_date', ascending=False)
-        
-        # Apply limit and offset
-        df = df.iloc[offset:offset+limit]
-        
-        # Convert to list of dictionaries
-        results = df.to_dict('records')
+        # Execute query
+        results = query_sorted(db_files, query, params, page_limit, page_offset)
+        
+        if facets:
+            # Grouping sets emulated with UNION ALL over one CTE; SQLite materializes a CTE
+            # that is referenced more than once, so the filter runs a single time
+            facet_query = (f"WITH matched AS (SELECT {', '.join(facets)} FROM news_articles WHERE {where}) "
+                           + " UNION ALL ".join(f"SELECT '{field}' AS facet, {field} AS value, COUNT(*) AS count"
+                                                f" FROM matched GROUP BY {field}" for field in facets))
+            for (field, value), count in query_counts(db_files, facet_query, params, ("facet", "value")).items():
+                facet_counts[field][value] = count
+        
+    elif os.path.exists('data/news_data.json') or os.path.exists('data/news_data.csv'):
+        # Use the bitmap index of the JSON file, or the CSV file
+        if os.path.exists('data/news_data.json'):
+            index = load_json_filter_index()
+        else:
+            index = load_csv_filter_index()
+        
+        results, facet_counts = query_filter_index(index, filters, since, until, tag, facets,
+                                                   page_limit, page_offset)
     
-    else:
+    elif not include_archive:
         return jsonify({"error": "No data files found"}), 404
     
-    return jsonify({
+    else:
+        results = []
+    
+    if include_archive:
+        archived, archived_facets = retention.search_archive(
+            countries=filters['country'], sources=filters['source'], languages=filters['language'],
+            since=since, until=until, tag=tag, limit=offset + limit, facets=facets
+        )
+        merged = heapq.merge(results, archived, key=lambda x: x['publication_date'], reverse=True)
+        results = list(itertools.islice(merged, offset, offset + limit))
+        
+        for field, counts in archived_facets.items():
+            for value, count in counts.items():
+                facet_counts[field][value] = facet_counts[field].get(value, 0) + count
+    
+    results = [{field: item[field] for field in fields if field in item} for item in results]
+    
+    response = {
         "count": len(results),
         "offset": offset,
         "limit": limit,
         "results": results
-    })
+    }
+    
+    if facets:
+        response["facets"] = {
+            field: [{"value": value, "count": count}
+                    for value, count in sorted(counts.items(), key=lambda item: item[1], reverse=True)]
+            for field, counts in facet_counts.items()
+        }
+    
+    return jsonify(response)
 
 @app.route('/api/countries', methods=['GET'])
+@conditional(DATA_FILES)
 def get_countries():
     """Get list of available countries"""
-    if os.path.exists('news_data.db'):
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        cursor.execute("SELECT DISTINCT country, COUNT(*) as count FROM news_articles GROUP BY country ORDER BY count DESC")
-        countries = [{"country": row["country"], "count": row["count"]} for row in cursor.fetchall()]
-        conn.close()
+    manifest = load_shard_manifest()
+    if manifest is not None or os.path.exists('news_data.db'):
+        counts = query_counts(get_db_files(manifest),
+                              "SELECT country, COUNT(*) as count FROM news_articles GROUP BY country",
+                              [], ("country",))
+        countries = [{"country": country, "count": count} for (country,), count in counts.items()]
+        countries.sort(key=lambda x: x["count"], reverse=True)
     
     elif os.path.exists('data/news_data.json'):
-        with open('data/news_data.json', 'r', encoding='utf-8') as file:
-            all_news = json.load(file)
+        all_news = load_json_data()
         
         # Count articles by country
         country_counts = {}
@@ -147,7 +545,7 @@ def get_countries():
         countries.sort(key=lambda x: x["count"], reverse=True)
     
     elif os.path.exists('data/news_data.csv'):
-        df = pd.read_csv('data/news_data.csv')
+        df = load_csv_data()
         country_counts = df['country'].value_counts().reset_index()
         country_counts.columns = ['country', 'count']
         countries = country_counts.to_dict('records')
@@ -158,30 +556,30 @@ def get_countries():
     return jsonify(countries)
 
 @app.route('/api/sources', methods=['GET'])
+@conditional(DATA_FILES)
 def get_sources():
     """Get list of available news sources"""
     country = request.args.get('country')
     
-    if os.path.exists('news_data.db'):
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
-        query = "SELECT DISTINCT source, country, COUNT(*) as count FROM news_articles"
+    manifest = load_shard_manifest()
+    if manifest is not None or os.path.exists('news_data.db'):
+        query = "SELECT source, country, COUNT(*) as count FROM news_articles"
         params = []
         
         if country:
             query += " WHERE country = ?"
             params.append(country)
         
-        query += " GROUP BY source, country ORDER BY count DESC"
+        query += " GROUP BY source, country"
         
-        cursor.execute(query, params)
-        sources = [{"source": row["source"], "country": row["country"], "count": row["count"]} for row in cursor.fetchall()]
-        conn.close()
+        counts = query_counts(get_db_files(manifest, countries=[country] if country else None),
+                              query, params, ("source", "country"))
+        sources = [{"source": source, "country": country, "count": count}
+                  for (source, country), count in counts.items()]
+        sources.sort(key=lambda x: x["count"], reverse=True)
     
     elif os.path.exists('data/news_data.json'):
-        with open('data/news_data.json', 'r', encoding='utf-8') as file:
-            all_news = json.load(file)
+        all_news = load_json_data()
         
         # Filter by country if specified
         if country:
@@ -204,7 +602,7 @@ def get_sources():
         sources.sort(key=lambda x: x["count"], reverse=True)
     
     elif os.path.exists('data/news_data.csv'):
-        df = pd.read_csv('data/news_data.csv')
+        df = load_csv_data()
         
         if country:
             df = df[df['country'] == country]
@@ -217,12 +615,135 @@ def get_sources():
     
     return jsonify(sources)
 
+@app.route('/api/tags', methods=['GET'])
+@conditional(DATA_FILES)
+def get_tags():
+    """Get the most used tags, optionally for one country and/or source"""
+    country = request.args.get('country')
+    source = request.args.get('source')
+    limit = request.args.get('limit', default=50, type=int)
+    
+    manifest = load_shard_manifest()
+    if manifest is not None or os.path.exists('news_data.db'):
+        db_files = get_db_files(manifest, countries=[country] if country else None)
+        if missing_table(db_files, 'article_tags'):
+            return schema_not_migrated("tag index")
+        
+        query = ("SELECT tags.name AS tag, COUNT(*) AS count FROM article_tags"
+                 " JOIN tags ON tags.id = article_tags.tag_id")
+        params = []
+        
+        if country or source:
+            query += " JOIN news_articles ON news_articles.id = article_tags.article_id WHERE 1=1"
+            if country:
+                query += " AND news_articles.country = ?"
+                params.append(country)
+            if source:
+                query += " AND news_articles.source = ?"
+                params.append(source)
+        
+        query += " GROUP BY tags.name"
+        
+        counts = query_counts(db_files, query, params, ("tag",))
+        tag_counts = {tag: count for (tag,), count in counts.items()}
+    
+    elif os.path.exists('data/news_data.json') or os.path.exists('data/news_data.csv'):
+        if os.path.exists('data/news_data.json'):
+            counts = load_json_tag_counts()
+        else:
+            counts = load_csv_tag_counts()
+        
+        tag_counts = {}
+        for (item_country, item_source, tag), count in counts.items():
+            if (not country or item_country == country) and (not source or item_source == source):
+                tag_counts[tag] = tag_counts.get(tag, 0) + count
+    
+    else:
+        return jsonify({"error": "No data files found"}), 404
+    
+    top_tags = heapq.nlargest(limit, tag_counts.items(), key=lambda item: item[1])
+    return jsonify([{"tag": tag, "count": count} for tag, count in top_tags])
+
+@app.route('/api/trends', methods=['GET'])
+@conditional(DATA_FILES)
+def get_trends():
+    """Get article counts per time bucket from the trend rollups"""
+    bucket = request.args.get('bucket', default='day')
+    since = request.args.get('since')
+    until = until_bound(request.args.get('until'))
+    country = request.args.get('country')
+    source = request.args.get('source')
+    language = request.args.get('language')
+    group_by = request.args.get('group_by')
+    
+    group_by = group_by.split(',') if group_by else []
+    if bucket not in trends.BUCKET_SIZES:
+        return jsonify({"error": f"bucket must be one of: {', '.join(trends.BUCKET_SIZES)}"}), 400
+    if any(field not in trends.GROUP_FIELDS for field in group_by):
+        return jsonify({"error": f"group_by fields must be among: {', '.join(trends.GROUP_FIELDS)}"}), 400
+    
+    filters = {"country": country, "source": source, "language": language}
+    
+    manifest = load_shard_manifest()
+    if manifest is not None or os.path.exists('news_data.db'):
+        # A bucket's rows live in the shards of its articles' local publication months,
+        # which can start a day before the UTC bucket and end a week after its start
+        db_files = get_db_files(manifest, countries=[country] if country else None,
+                                since=shift_date(since, -1), until=shift_date(until, 8))
+        if missing_table(db_files, 'trend_rollups'):
+            return schema_not_migrated("trend rollups")
+        
+        group_columns = "".join(f", {field}" for field in group_by)
+        query = f"SELECT bucket_start{group_columns}, SUM(count) AS count FROM trend_rollups WHERE bucket_size = ?"
+        params = [bucket]
+        
+        if since:
+            query += " AND bucket_start >= ?"
+            params.append(since)
+        
+        if until:
+            query += " AND bucket_start <= ?"
+            params.append(until)
+        
+        for field, value in filters.items():
+            if value:
+                query += f" AND {field} = ?"
+                params.append(value)
+        
+        query += f" GROUP BY bucket_start{group_columns}"
+        
+        counts = query_counts(db_files, query, params, ["bucket_start"] + group_by)
+    
+    elif os.path.exists(trends.TRENDS_FILE):
+        rollups = _load_cached(trends.TRENDS_FILE, _read_json)
+        
+        counts = {}
+        for bucket_start, rows in rollups.get(bucket, {}).items():
+            if (since and bucket_start < since) or (until and bucket_start > until):
+                continue
+            for country_value, source_value, language_value, count in rows:
+                row = {"country": country_value, "source": source_value, "language": language_value}
+                if any(value and row[field] != value for field, value in filters.items()):
+                    continue
+                key = (bucket_start,) + tuple(row[field] for field in group_by)
+                counts[key] = counts.get(key, 0) + count
+    
+    else:
+        return jsonify({"error": "No trend data found"}), 404
+    
+    series = [dict(zip(["bucket_start"] + group_by, key), count=count) for key, count in sorted(counts.items())]
+    return jsonify({
+        "bucket": bucket,
+        "group_by": group_by,
+        "results": series
+    })
+
 @app.route('/api/report', methods=['GET'])
+@conditional(REPORT_FILES)
 def get_report():
     """Get summary report"""
     if os.path.exists('data/report.json'):
-        with open('data/report.json', 'r', encoding='utf-8') as file:
-            report = json.load(file)
+        report = _load_cached('data/report.json', _read_json)
         return jsonify(report)
     else:
         return jsonify({"error": "Report file not found"}), 404
@@ -253,15 +774,21 @@ def home():
             <p>Returns a list of news articles with optional filtering.</p>
             <h3>Parameters:</h3>
             <ul>
-                <li><code>country</code> - Filter by country</li>
-                <li><code>source</code> - Filter by news source</li>
-                <li><code>language</code> - Filter by article language</li>
+                <li><code>country</code> - Filter by country (comma-separated for several)</li>
+                <li><code>source</code> - Filter by news source (comma-separated for several)</li>
+                <li><code>language</code> - Filter by article language (comma-separated for several)</li>
                 <li><code>since</code> - Filter by publication date (ISO format)</li>
+                <li><code>until</code> - Latest publication date to include (ISO format)</li>
+                <li><code>tag</code> - Filter by feed tag/keyword (case-insensitive)</li>
                 <li><code>limit</code> - Maximum number of results (default: 100)</li>
                 <li><code>offset</code> - Result offset for pagination (default: 0)</li>
+                <li><code>include_archive</code> - Also search archived articles (default: false)</li>
+                <li><code>fields</code> - Comma-separated fields to return (default: all except <code>content</code>)</li>
+                <li><code>facets</code> - Comma-separated fields to count over all matching articles: <code>country</code>, <code>source</code>, <code>language</code></li>
             </ul>
             <h3>Example:</h3>
             <pre>GET /api/news?country=USA&limit=10</pre>
+            <pre>GET /api/news?country=USA,UK&until=2024-06-30&facets=source,language</pre>
         </div>
         
         <div class="endpoint">
@@ -284,6 +811,36 @@ def home():
             <pre>GET /api/sources?country=UK</pre>
         </div>
         
+        <div class="endpoint">
+            <h2>Get Tags</h2>
+            <code>GET /api/tags</code>
+            <p>Returns the most used tags with article counts.</p>
+            <h3>Parameters:</h3>
+            <ul>
+                <li><code>country</code> - Only count articles from this country</li>
+                <li><code>source</code> - Only count articles from this news source</li>
+                <li><code>limit</code> - Maximum number of tags (default: 50)</li>
+            </ul>
+            <h3>Example:</h3>
+            <pre>GET /api/tags?country=UK&limit=10</pre>
+        </div>
+        
+        <div class="endpoint">
+            <h2>Get Trends</h2>
+            <code>GET /api/trends</code>
+            <p>Returns article counts per time bucket, served from rollups maintained at ingest time.</p>
+            <h3>Parameters:</h3>
+            <ul>
+                <li><code>bucket</code> - Bucket size: <code>hour</code>, <code>day</code> or <code>week</code> (default: day)</li>
+                <li><code>since</code> - First bucket start to include (ISO format)</li>
+                <li><code>until</code> - Last bucket start to include (ISO format)</li>
+                <li><code>country</code>, <code>source</code>, <code>language</code> - Only count matching articles</li>
+                <li><code>group_by</code> - Comma-separated breakdown: <code>country</code>, <code>source</code>, <code>language</code></li>
+            </ul>
+            <h3>Example:</h3>
+            <pre>GET /api/trends?bucket=hour&since=2024-05-01&group_by=country</pre>
+        </div>
+        
         <div class="endpoint">
             <h2>Get Report</h2>
             <code>GET /api/report</code>
@@ -295,5 +852,69 @@ def home():
     </html>
     """
 
+def run_production_server(host, port, workers, threads):
+    """
+    Serve the API with gunicorn using multiple worker processes.
+    
+    Args:
+        host (str): Interface to bind to
+        port (int): Port to listen on
+        workers (int): Number of worker processes
+        threads (int): Number of threads per worker process
+    """
+    from gunicorn.app.base import BaseApplication
+    
+    class NewsAPIApplication(BaseApplication):
+        def __init__(self, application, options):
+            self.application = application
+            self.options = options
+            super().__init__()
+        
+        def load_config(self):
+            for key, value in self.options.items():
+                self.cfg.set(key, value)
+        
+        def load(self):
+            return self.application
+    
+    options = {
+        "bind": f"{host}:{port}",
+        "workers": workers,
+        "threads": threads,
+        "worker_class": "gthread",
+        # Load the app before forking so workers share its read-only memory pages
+        "preload_app": True,
+        "keepalive": 5,
+        # Recycle workers periodically; gunicorn restarts them one at a time
+        "max_requests": 10000,
+        "max_requests_jitter": 1000,
+        "graceful_timeout": 30,
+    }
+    NewsAPIApplication(app, options).run()
+
+
 if __name__ == '__main__':
-    app.run(debug=True, host='0.0.0.0', port=5000)
\ No newline at end of file
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="RSS News API server")
+    parser.add_argument("--host", default="0.0.0.0",
+                      help="Interface to bind to (default: 0.0.0.0)")
+    parser.add_argument("--port", type=int, default=5000,
+                      help="Port to listen on (default: 5000)")
+    parser.add_argument("--workers", type=int,
+                      default=int(os.environ.get("API_WORKERS", multiprocessing.cpu_count() * 2 + 1)),
+                      help="Number of worker processes (default: API_WORKERS or 2 x CPUs + 1)")
+    parser.add_argument("--threads", type=int, default=int(os.environ.get("API_THREADS", 4)),
+                      help="Threads per worker process (default: API_THREADS or 4)")
+    parser.add_argument("--dev", action="store_true",
+                      help="Run the single-process Flask development server with debugging")
+    
+    args = parser.parse_args()
+    
+    if args.dev:
+        app.run(debug=True, host=args.host, port=args.port)
+    else:
+        try:
+            run_production_server(args.host, args.port, args.workers, args.threads)
+        except ImportError:
+            parser.error("gunicorn is required for production serving (pip install gunicorn), or use --dev")
\ No newline at end of file
@@ -0,0 +1,70 @@
+"""
+Compact article record and JSON encoding.
+
+Articles are held as slotted Article objects between scraping and saving, and
+encode themselves to dicts and SQLite/CSV rows. JSON encoding
+uses orjson when it is installed and falls back to the standard library.
+"""
+import json
+from storage import ARTICLE_COLUMNS
+
+try:
+    import orjson
+except ImportError:  # orjson is optional, the stdlib encoder is used without it
+    orjson = None
+
+def loads(data):
+    """Decode a JSON string or bytes, using orjson when available"""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+def dumps(obj, indent=False, sort_keys=False):
+    """Encode an object as a JSON string, using orjson when available"""
+    if orjson is not None:
+        option = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        if sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        return orjson.dumps(obj, option=option).decode('utf-8')
+    return json.dumps(obj, ensure_ascii=False, indent=2 if indent else None, sort_keys=sort_keys)
+
+class Article:
+    __slots__ = ARTICLE_COLUMNS
+
+    def __init__(self, title, publication_date, source, country, language,
+                 summary="", url="", content="", keywords="", scraped_date=""):
+        """
+        Create an article record. All fields are strings.
+
+        Raises:
+            ValueError: If a field is not a string, or the title or publication date is empty
+        """
+        values = (title, publication_date, source, country, language,
+                  summary, url, content, keywords, scraped_date)
+        for field, value in zip(ARTICLE_COLUMNS, values):
+            if not isinstance(value, str):
+                raise ValueError(f"Article field {field} must be a string, got {type(value).__name__}")
+            setattr(self, field, value)
+
+        if not title:
+            raise ValueError("Article title must not be empty")
+        if not publication_date:
+            raise ValueError("Article publication_date must not be empty")
+
+    def __getitem__(self, field):
+        """Dict-style read access, so code handling article dicts also accepts records"""
+        if field not in ARTICLE_COLUMNS:
+            raise KeyError(field)
+        return getattr(self, field)
+
+    def __repr__(self):
+        return f"Article({self.title!r}, {self.url!r})"
+
+    def to_row(self):
+        """Field values in ARTICLE_COLUMNS order, for SQLite and CSV rows"""
+        return tuple(getattr(self, field) for field in ARTICLE_COLUMNS)
+
+    def to_dict(self):
+        return dict(zip(ARTICLE_COLUMNS, self.to_row()))
@@ -0,0 +1,151 @@
+"""
+Per-feed health tracking with exponential backoff and circuit breaking.
+
+Every fetch of a feed records its latency and outcome. After a number of
+consecutive failures the feed's circuit opens and the feed is skipped until
+its backoff expires; then a single trial fetch (half-open) decides whether the
+circuit closes again or the backoff doubles. The state persists between runs.
+"""
+import os
+import json
+import logging
+from datetime import datetime, timedelta
+
+logger = logging.getLogger(__name__)
+
+HEALTH_FILE = 'data/feed_health.json'
+
+# Weight of the newest observation in the moving averages
+EWMA_ALPHA = 0.3
+
+class FeedHealth:
+    def __init__(self, path=HEALTH_FILE, failure_threshold=3, base_backoff=900, max_backoff=7 * 86400,
+                 archive_retry_days=7):
+        """
+        Load the persisted feed health state.
+
+        Args:
+            path (str): JSON file holding the state
+            failure_threshold (int): Consecutive failures that open a feed's circuit
+            base_backoff (int): Seconds a circuit stays open after it first opens
+            max_backoff (int): Upper bound in seconds for the doubling backoff
+            archive_retry_days (int): Days to wait before probing archives again when none were found
+        """
+        self.path = path
+        self.failure_threshold = failure_threshold
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.archive_retry_days = archive_retry_days
+
+        try:
+            with open(path, 'r', encoding='utf-8') as file:
+                self.feeds = json.load(file)
+        except (FileNotFoundError, json.JSONDecodeError):
+            self.feeds = {}
+
+    def _state(self, feed_info):
+        """Get the health state of a feed, creating it on first use"""
+        url = feed_info["url"]
+        if url not in self.feeds:
+            self.feeds[url] = {
+                "source": feed_info.get("source"),
+                "country": feed_info.get("country"),
+                "circuit": "closed",
+                "requests": 0,
+                "failures": 0,
+                "consecutive_failures": 0,
+                "error_rate": 0.0,
+                "avg_latency": None,
+                "last_latency": None,
+                "last_success": None,
+                "last_failure": None,
+                "last_error": None,
+                "next_attempt": None,
+                "archives_checked": None,
+                "archives_found": None,
+            }
+        return self.feeds[url]
+
+    def should_fetch(self, feed_info):
+        """
+        Whether a feed should be fetched in this run.
+
+        An open circuit whose backoff has expired moves to half-open and allows one trial.
+        """
+        state = self._state(feed_info)
+        if state["circuit"] == "closed":
+            return True
+
+        if state["circuit"] == "open" and datetime.now() >= datetime.fromisoformat(state["next_attempt"]):
+            state["circuit"] = "half_open"
+        return state["circuit"] == "half_open"
+
+    def _record(self, state, latency, failed):
+        state["requests"] += 1
+        state["last_latency"] = round(latency, 3)
+        if state["avg_latency"] is None:
+            state["avg_latency"] = state["last_latency"]
+        else:
+            state["avg_latency"] = round(EWMA_ALPHA * latency + (1 - EWMA_ALPHA) * state["avg_latency"], 3)
+        state["error_rate"] = round(EWMA_ALPHA * failed + (1 - EWMA_ALPHA) * state["error_rate"], 3)
+
+    def record_success(self, feed_info, latency):
+        """Record a successful fetch; closes the circuit"""
+        state = self._state(feed_info)
+        self._record(state, latency, failed=False)
+        state["consecutive_failures"] = 0
+        state["last_success"] = datetime.now().isoformat()
+        state["circuit"] = "closed"
+        state["next_attempt"] = None
+
+    def record_failure(self, feed_info, latency, error):
+        """Record a failed fetch; opens the circuit with exponential backoff past the threshold"""
+        state = self._state(feed_info)
+        self._record(state, latency, failed=True)
+        state["failures"] += 1
+        state["consecutive_failures"] += 1
+        state["last_failure"] = datetime.now().isoformat()
+        state["last_error"] = str(error)[:500]
+
+        excess = state["consecutive_failures"] - self.failure_threshold
+        if excess >= 0:
+            backoff = min(self.max_backoff, self.base_backoff * 2 ** excess)
+            state["circuit"] = "open"
+            state["next_attempt"] = (datetime.now() + timedelta(seconds=backoff)).isoformat()
+            logger.warning(f"Circuit open for {state['source']} after {state['consecutive_failures']} "
+                           f"failures, next attempt at {state['next_attempt']}")
+
+    def is_healthy(self, feed_info):
+        """Whether the feed's last fetch succeeded"""
+        state = self._state(feed_info)
+        return state["consecutive_failures"] == 0 and state["last_success"] is not None
+
+    def should_probe_archives(self, feed_info):
+        """Whether to probe archive URLs; skipped for a while after a probe found none"""
+        state = self._state(feed_info)
+        if state["archives_found"] or state["archives_checked"] is None:
+            return True
+        retry_at = datetime.fromisoformat(state["archives_checked"]) + timedelta(days=self.archive_retry_days)
+        return datetime.now() >= retry_at
+
+    def record_archive_probe(self, feed_info, found):
+        """Record how many archive feeds a historical probe found"""
+        state = self._state(feed_info)
+        state["archives_checked"] = datetime.now().isoformat()
+        state["archives_found"] = found
+
+    def summary(self):
+        """Health of every feed, for the run report"""
+        return {
+            url: {key: state[key] for key in (
+                "source", "country", "circuit", "consecutive_failures", "error_rate",
+                "avg_latency", "last_success", "last_error", "next_attempt"
+            )}
+            for url, state in sorted(self.feeds.items())
+        }
+
+    def save(self):
+        """Atomically persist the health state"""
+        with open(self.path + ".tmp", 'w', encoding='utf-8') as file:
+            json.dump(self.feeds, file, ensure_ascii=False, indent=2)
+        os.replace(self.path + ".tmp", self.path)
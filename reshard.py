@@ -0,0 +1,126 @@
+"""
+Reshard an existing news database.
+
+Copies every article from a single SQLite database, or from an existing shard
+directory, into a new shard directory sharded by country or by month.
+"""
+import os
+import sys
+import sqlite3
+import logging
+import argparse
+import storage
+import trends
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 5000
+
+def reshard(source_files, shard_by, shard_dir):
+    """
+    Copy articles from source databases into a new set of shards.
+
+    Args:
+        source_files (list): SQLite database files to read articles from
+        shard_by (str): "country" or "month"
+        shard_dir (str): Directory to create the shards in
+
+    Returns:
+        int: Number of articles copied
+    """
+    os.makedirs(shard_dir, exist_ok=True)
+    manifest = storage.load_manifest(shard_dir) or storage.new_manifest(shard_by)
+    if manifest["shard_by"] != shard_by:
+        raise ValueError(f"{shard_dir} is already sharded by {manifest['shard_by']}")
+
+    columns = ", ".join(storage.ARTICLE_COLUMNS)
+    placeholders = ", ".join("?" for _ in storage.ARTICLE_COLUMNS)
+    shard_conns = {}
+    shard_codecs = {}
+    copied = 0
+
+    try:
+        for source_file in source_files:
+            logger.info(f"Resharding {source_file}")
+            source = sqlite3.connect(f"file:{source_file}?mode=ro", uri=True)
+            source.row_factory = sqlite3.Row
+            source_codec = storage.TextCodec(source)
+            expected = source.execute("SELECT COUNT(*) FROM news_articles").fetchone()[0]
+            source_copied = 0
+            rows_cursor = source.execute(f"SELECT {columns} FROM news_articles ORDER BY id")
+
+            while True:
+                rows = rows_cursor.fetchmany(BATCH_SIZE)
+                if not rows:
+                    break
+
+                # Dictionaries are per database, so compressed text is decoded here
+                # and re-encoded with the target shard's dictionary
+                shard_articles = {}
+                for row in rows:
+                    article = source_codec.decode_article(dict(row))
+                    db_file = storage.get_shard_file(manifest, storage.shard_key(article, shard_by), shard_dir)
+                    shard_articles.setdefault(db_file, []).append(article)
+
+                for db_file, articles in shard_articles.items():
+                    if db_file not in shard_conns:
+                        shard_conns[db_file] = sqlite3.connect(db_file)
+                        shard_codecs[db_file] = storage.TextCodec(shard_conns[db_file])
+
+                    conn = shard_conns[db_file]
+                    codec = shard_codecs[db_file]
+                    codec.train([article["content"] or article["summary"] for article in articles])
+                    inserted = []
+                    for article in articles:
+                        insert_cursor = conn.execute(
+                            f"INSERT OR IGNORE INTO news_articles ({columns}) VALUES ({placeholders})",
+                            tuple(codec.encode(article[column]) if column in storage.COMPRESSED_COLUMNS
+                                  else article[column] for column in storage.ARTICLE_COLUMNS)
+                        )
+                        if insert_cursor.rowcount == 1:
+                            storage.add_article_tags(conn, insert_cursor.lastrowid, article["keywords"])
+                            inserted.append(article)
+                    trends.update_db_rollups(conn, trends.rollup_counts(inserted))
+                source_copied += len(rows)
+
+                for conn in shard_conns.values():
+                    conn.commit()
+
+            source.close()
+            if source_copied != expected:
+                raise RuntimeError(f"Read {source_copied} of {expected} articles from {source_file}")
+            copied += source_copied
+    finally:
+        for conn in shard_conns.values():
+            conn.commit()
+            conn.close()
+
+    storage.save_manifest(manifest, shard_dir)
+    logger.info(f"Copied {copied} articles into {len(manifest['shards'])} shards in {shard_dir}")
+    return copied
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Reshard the news article database")
+    parser.add_argument("--shard-by", choices=storage.SHARD_SCHEMES, required=True,
+                      help="Shard by country or by publication month")
+    parser.add_argument("--source", default="news_data.db",
+                      help="Database file or shard directory to read from (default: news_data.db)")
+    parser.add_argument("--shard-dir", default=storage.SHARD_DIR,
+                      help=f"Directory for the new shards (default: {storage.SHARD_DIR})")
+
+    args = parser.parse_args()
+
+    if os.path.isdir(args.source):
+        if os.path.abspath(args.source) == os.path.abspath(args.shard_dir):
+            parser.error("--source and --shard-dir must be different directories")
+        source_files = storage.all_shard_paths(args.source)
+    else:
+        source_files = [args.source]
+
+    if not source_files:
+        logger.error(f"No articles found in {args.source}")
+        sys.exit(1)
+
+    reshard(source_files, args.shard_by, args.shard_dir)
@@ -0,0 +1,217 @@
+"""
+Retention and archival for the article store.
+
+Articles older than their source's retention period are moved out of the hot
+store (SQLite database or shards, JSON or CSV file) into gzip-compressed JSON
+Lines archives, one per publication month, and the hot store is compacted.
+Archives stay queryable through search_archive().
+"""
+import os
+import gzip
+import glob
+import heapq
+import sqlite3
+import logging
+import pandas as pd
+import storage
+from article import dumps, loads
+from datetime import datetime, timedelta
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE_DIR = 'data/archive'
+
+class RetentionPolicy:
+    def __init__(self, default_days=None, source_days=None, now=None):
+        """
+        Per-source age limits for articles.
+
+        Args:
+            default_days (int): Days to keep articles of sources without their own limit (None keeps forever)
+            source_days (dict): Source name -> days to keep its articles
+            now (datetime): Reference time for the cutoffs
+        """
+        self.default_days = default_days
+        self.source_days = source_days or {}
+        self.now = now or datetime.now()
+
+    @classmethod
+    def from_feeds(cls, feeds_list, default_days=None):
+        """Build a policy from the "retention_days" entries in feeds.json"""
+        source_days = {feed["source"]: feed["retention_days"]
+                       for feed in feeds_list if feed.get("retention_days") is not None}
+        return cls(default_days, source_days)
+
+    def is_active(self):
+        """Whether the policy can expire anything at all"""
+        return self.default_days is not None or bool(self.source_days)
+
+    def cutoff(self, source):
+        """ISO date before which articles of a source expire, or None to keep them"""
+        days = self.source_days.get(source, self.default_days)
+        if days is None:
+            return None
+        return (self.now - timedelta(days=days)).strftime("%Y-%m-%dT%H:%M:%S")
+
+    def is_expired(self, article):
+        """Whether an article is older than its source's retention period"""
+        cutoff = self.cutoff(article["source"])
+        return cutoff is not None and article["publication_date"] < cutoff
+
+def archive_articles(articles, archive_dir=ARCHIVE_DIR):
+    """
+    Append articles to the monthly gzip JSON Lines archives.
+
+    Each call appends a new gzip member, which gzip readers treat as one stream.
+    """
+    if not articles:
+        return
+
+    os.makedirs(archive_dir, exist_ok=True)
+
+    by_month = {}
+    for article in articles:
+        by_month.setdefault(article["publication_date"][:7], []).append(article)
+
+    for month, month_articles in by_month.items():
+        path = os.path.join(archive_dir, f"{month}.jsonl.gz")
+        with gzip.open(path, 'at', encoding='utf-8') as file:
+            for article in month_articles:
+                file.write(dumps(article) + "\n")
+            file.flush()
+            os.fsync(file.fileno())
+
+def archive_database(db_file, policy, archive_dir=ARCHIVE_DIR):
+    """
+    Move expired articles from a SQLite database into the archive and compact it.
+
+    Returns:
+        int: Number of archived articles
+    """
+    conn = sqlite3.connect(db_file)
+    conn.row_factory = sqlite3.Row
+    codec = storage.TextCodec(conn)
+    archived = 0
+
+    sources = [row["source"] for row in conn.execute("SELECT DISTINCT source FROM news_articles")]
+    for source in sources:
+        cutoff = policy.cutoff(source)
+        if cutoff is None:
+            continue
+
+        rows = conn.execute(
+            "SELECT * FROM news_articles WHERE source = ? AND publication_date < ?", (source, cutoff)
+        ).fetchall()
+        if not rows:
+            continue
+
+        # Archive before deleting, so a crash can only duplicate, never lose, articles
+        articles = [codec.decode_article(dict(row)) for row in rows]
+        for article in articles:
+            article.pop("id", None)
+        archive_articles(articles, archive_dir)
+
+        conn.execute(
+            "DELETE FROM article_tags WHERE article_id IN "
+            "(SELECT id FROM news_articles WHERE source = ? AND publication_date < ?)", (source, cutoff)
+        )
+        conn.execute("DELETE FROM news_articles WHERE source = ? AND publication_date < ?", (source, cutoff))
+        conn.commit()
+        archived += len(rows)
+
+    if archived:
+        conn.execute("VACUUM")
+    conn.close()
+
+    logger.info(f"Archived {archived} articles from {db_file}")
+    return archived
+
+def archive_json_file(filename, policy, archive_dir=ARCHIVE_DIR):
+    """Move expired articles from the JSON data file into the archive"""
+    if not os.path.exists(filename):
+        return 0
+
+    with open(filename, 'rb') as file:
+        articles = loads(file.read())
+
+    expired = [article for article in articles if policy.is_expired(article)]
+    if not expired:
+        return 0
+
+    archive_articles(expired, archive_dir)
+
+    hot = [article for article in articles if not policy.is_expired(article)]
+    with open(filename + ".tmp", 'w', encoding='utf-8') as file:
+        file.write(dumps(hot, indent=True))
+    os.replace(filename + ".tmp", filename)
+
+    logger.info(f"Archived {len(expired)} articles from {filename}")
+    return len(expired)
+
+def archive_csv_file(filename, policy, archive_dir=ARCHIVE_DIR):
+    """Move expired articles from the CSV data file into the archive"""
+    if not os.path.exists(filename):
+        return 0
+
+    df = pd.read_csv(filename, keep_default_na=False)
+    expired_mask = df.apply(policy.is_expired, axis=1) if len(df) else pd.Series(dtype=bool)
+    if not expired_mask.any():
+        return 0
+
+    archive_articles(df[expired_mask].to_dict('records'), archive_dir)
+
+    df[~expired_mask].to_csv(filename + ".tmp", index=False, encoding='utf-8')
+    os.replace(filename + ".tmp", filename)
+
+    archived = int(expired_mask.sum())
+    logger.info(f"Archived {archived} articles from {filename}")
+    return archived
+
+def _iter_archive(path):
+    """Read the articles of one archive file"""
+    with gzip.open(path, 'rt', encoding='utf-8') as file:
+        for line in file:
+            if line.strip():
+                yield loads(line)
+
+def search_archive(countries=None, sources=None, languages=None, since=None, until=None, tag=None,
+                   limit=100, facets=(), archive_dir=ARCHIVE_DIR):
+    """
+    Find archived articles matching the filters.
+
+    Args:
+        countries, sources, languages (list): Accepted values for each field (empty accepts all)
+        since, until (str): Inclusive publication date bounds
+        tag (str): Normalized tag the article must carry
+        limit (int): Maximum number of articles to return
+        facets (list): Fields to count values of over all matching articles
+
+    Returns:
+        tuple: (up to limit articles newest first, {facet field: {value: count}})
+    """
+    paths = sorted(glob.glob(os.path.join(archive_dir, "*.jsonl.gz")))
+    # Archives are named by publication month, so files outside the range cannot match
+    if since:
+        paths = [path for path in paths if os.path.basename(path)[:7] >= since[:7]]
+    if until:
+        paths = [path for path in paths if os.path.basename(path)[:7] <= until[:7]]
+
+    filters = {"country": set(countries or ()), "source": set(sources or ()), "language": set(languages or ())}
+    facet_counts = {field: {} for field in facets}
+
+    def matches(article):
+        if any(values and article[field] not in values for field, values in filters.items()):
+            return False
+        if (since and article["publication_date"] < since) or (until and article["publication_date"] > until):
+            return False
+        if tag and tag not in storage.normalize_tags(article["keywords"]):
+            return False
+
+        # Facets are counted in the same pass that filters the articles
+        for field, counts in facet_counts.items():
+            counts[article[field]] = counts.get(article[field], 0) + 1
+        return True
+
+    matching = (article for path in paths for article in _iter_archive(path) if matches(article))
+    articles = heapq.nlargest(limit, matching, key=lambda article: article["publication_date"])
+    return articles, facet_counts
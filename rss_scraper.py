@@ -12,6 +12,14 @@ from bs4 import BeautifulSoup
 from langdetect import detect
 from urllib.parse import urlparse
 from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+import storage
+import retention
+import trends
+from article import Article
+import article as article_codec
+from seen_index import SeenIndex
+from feed_health import FeedHealth
 
 # Set up logging
 logging.basicConfig(
@@ -27,8 +35,12 @@ logger = logging.getLogger(__name__)
 # Create directory for data if it doesn't exist
 os.makedirs('data', exist_ok=True)
 
+# Seconds to wait for a feed before counting it as failed
+FEED_TIMEOUT = 15
+
 class RSSFeedScraper:
-    def __init__(self, db_file='news_data.db', user_agent="NewsScraperBot/1.0", data_format="json"):
+    def __init__(self, db_file='news_data.db', user_agent="NewsScraperBot/1.0", data_format="json",
+                 shard_by=None, shard_dir=storage.SHARD_DIR, retention_days=None, skip_seen=True):
         """
         Initialize the RSS Feed Scraper.
         
@@ -36,45 +48,69 @@ class RSSFeedScraper:
             db_file (str): SQLite database file name
             user_agent (str): User agent for HTTP requests
             data_format (str): Output format - "json", "csv", or "db"
+            shard_by (str): For db format, shard articles by "country" or "month"
+            shard_dir (str): Directory holding the shard databases
+            retention_days (int): Days to keep articles of feeds without their own "retention_days"
+            skip_seen (bool): Skip feed entries already scraped in earlier runs before enriching them
         """
         self.headers = {"User-Agent": user_agent}
         self.feeds_list = []
         self.data_format = data_format.lower()
         self.db_file = db_file
+        self.shard_by = shard_by
+        self.shard_dir = shard_dir
+        self.manifest = None
+        
+        # Entries already scraped are skipped before any parsing, cleaning or fetching
+        self.seen_index = SeenIndex() if skip_seen else None
+        # (article, seen key) pairs of this run, recorded once the article is saved
+        self.pending_seen_keys = []
+        
+        # Latency, errors and backoff of every feed across runs
+        self.feed_health = FeedHealth()
         
         # Initialize database if format is db
         if self.data_format == "db":
-            self._init_db()
+            if self.shard_by:
+                self._init_shards()
+            else:
+                self._init_db()
         
         # Load RSS feeds from the feeds.json file
         self._load_feeds()
+        
+        self.retention_policy = retention.RetentionPolicy.from_feeds(self.feeds_list, retention_days)
 
     def _init_db(self):
         """Initialize SQLite database with required schema"""
-        conn = sqlite3.connect(self.db_file)
-        c = conn.cursor()
-        
-        # Create table if it doesn't exist
-        c.execute('''
-            CREATE TABLE IF NOT EXISTS news_articles (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                title TEXT,
-                publication_date TEXT,
-                source TEXT,
-                country TEXT,
-                language TEXT,
-                summary TEXT,
-                url TEXT UNIQUE,
-                content TEXT,
-                keywords TEXT,
-                scraped_date TEXT
-            )
-        ''')
-        
-        conn.commit()
-        conn.close()
+        storage.init_database(self.db_file)
         logger.info(f"Database initialized at {self.db_file}")
 
+    def _init_shards(self):
+        """Load or create the shard manifest for sharded database storage"""
+        os.makedirs(self.shard_dir, exist_ok=True)
+        self.manifest = storage.load_manifest(self.shard_dir)
+        
+        if self.manifest is None:
+            self.manifest = storage.new_manifest(self.shard_by)
+            storage.save_manifest(self.manifest, self.shard_dir)
+        elif self.manifest["shard_by"] != self.shard_by:
+            logger.error(f"{self.shard_dir} is sharded by {self.manifest['shard_by']}, not {self.shard_by}. "
+                         f"Use reshard.py to change the sharding scheme.")
+            exit(1)
+        
+        # Bring existing shards up to the current schema
+        for db_file in storage.shard_paths(self.manifest, self.shard_dir):
+            storage.init_database(db_file)
+        
+        logger.info(f"Using {len(self.manifest['shards'])} shards by {self.shard_by} in {self.shard_dir}")
+
+    def _database_files(self):
+        """Get all database files holding articles"""
+        if self.manifest is not None:
+            return storage.shard_paths(self.manifest, self.shard_dir)
+        return [self.db_file]
+
     def _load_feeds(self):
         """Load RSS feeds from feeds.json file"""
         try:
@@ -143,29 +179,52 @@ class RSSFeedScraper:
             logger.warning(f"Error extracting content from {url}: {e}")
             return ""
 
-    def scrape_feed(self, feed_info):
+    def _fetch_feed(self, url):
+        """Fetch and parse a feed, failing after FEED_TIMEOUT seconds"""
+        response = requests.get(url, headers=self.headers, timeout=FEED_TIMEOUT)
+        response.raise_for_status()
+        return feedparser.parse(response.content, response_headers=response.headers)
+
+    def scrape_feed(self, feed_info, track_health=True, feed=None):
         """
         Scrape a single RSS feed and return articles data.
         
         Args:
             feed_info (dict): Dictionary with feed information
+            track_health (bool): Record the fetch in the feed health state and skip
+                feeds whose circuit is open
+            feed (FeedParserDict): Feed that was already fetched, parsed instead of fetching the URL again
             
         Returns:
-            list: List of dictionaries with article data
+            list: List of Article records
         """
         url = feed_info["url"]
         country = feed_info["country"]
         source = feed_info["source"]
         
+        if track_health and not self.feed_health.should_fetch(feed_info):
+            logger.info(f"Skipping feed {source} ({country}): circuit open after repeated failures")
+            return []
+        
         logger.info(f"Scraping feed: {source} ({country}) - {url}")
         
         articles = []
+        skipped = 0
+        started = time.monotonic()
         try:
-            # Add delay to respect rate limits
-            time.sleep(1)
-            
-            # Parse RSS feed
-            feed = feedparser.parse(url)
+            if feed is None:
+                # Add delay to respect rate limits
+                time.sleep(1)
+                
+                # Fetch and parse RSS feed, timing the request for health tracking
+                started = time.monotonic()
+                feed = self._fetch_feed(url)
+                
+                if feed.bozo and not feed.entries:
+                    raise ValueError(f"Invalid feed: {feed.get('bozo_exception')}")
+                
+                if track_health:
+                    self.feed_health.record_success(feed_info, time.monotonic() - started)
             
             for entry in feed.entries:
                 try:
@@ -173,9 +232,17 @@ class RSSFeedScraper:
                     title = entry.get("title", "").strip()
                     if not title:  # Skip entries without title
                         continue
+                    
+                    link = entry.get("link", "")
+                    
+                    # Skip entries scraped in an earlier run before doing any expensive work
+                    seen_key = entry.get("id") or link
+                    if self.seen_index is not None and seen_key:
+                        if seen_key in self.seen_index:
+                            skipped += 1
+                            continue
                         
                     publication_date = self._parse_date(entry.get("published", ""))
-                    link = entry.get("link", "")
                     
                     # Extract summary/description
                     summary = ""
@@ -202,29 +269,33 @@ class RSSFeedScraper:
                     if "tags" in entry:
                         keywords = [tag.term for tag in entry.tags if hasattr(tag, 'term')]
                     
-                    # Create article dictionary
-                    article = {
-                        "title": title,
-                        "publication_date": publication_date,
-                        "source": source,
-                        "country": country,
-                        "language": language,
-                        "summary": summary,
-                        "url": link,
-                        "content": content,
-                        "keywords": ",".join(keywords),
-                        "scraped_date": datetime.now().isoformat()
-                    }
+                    # Create article record
+                    article = Article(
+                        title=title,
+                        publication_date=publication_date,
+                        source=source,
+                        country=country,
+                        language=language,
+                        summary=summary,
+                        url=link,
+                        content=content,
+                        keywords=",".join(keywords),
+                        scraped_date=datetime.now().isoformat()
+                    )
                     
                     articles.append(article)
+                    if self.seen_index is not None and seen_key:
+                        self.pending_seen_keys.append((article, seen_key))
                 except Exception as e:
                     logger.warning(f"Error processing entry in {source}: {e}")
             
-            logger.info(f"Scraped {len(articles)} articles from {source}")
+            logger.info(f"Scraped {len(articles)} articles from {source} ({skipped} already seen)")
             return articles
             
         except Exception as e:
             logger.error(f"Error scraping feed {url}: {e}")
+            if track_health:
+                self.feed_health.record_failure(feed_info, time.monotonic() - started, e)
             return []
 
     def scrape_historical_data(self, feed_info, months_back=12):
@@ -240,6 +311,7 @@ class RSSFeedScraper:
             list: List of dictionaries with historical article data
         """
         all_articles = []
+        archives_found = 0
         source = feed_info["source"]
         
         # This is a simplified approach - many news sites don't expose historical data via RSS
@@ -252,6 +324,7 @@ class RSSFeedScraper:
         
         # Try common archive patterns (this is speculative and will only work for some sites)
         current_date = datetime.now()
+        archive_urls = []
         
         for i in range(months_back):
             target_date = current_date - timedelta(days=30*i)
@@ -259,44 +332,90 @@ class RSSFeedScraper:
             month = target_date.month
             
             # Try some common archive URL patterns
-            archive_urls = [
+            archive_urls.extend([
                 f"https://{domain}/archive/{year}/{month:02d}/rss.xml",
                 f"https://{domain}/archives/{year}/{month:02d}/feed",
                 f"https://{domain}/{year}/{month:02d}/feed",
                 f"https://{domain}/feed/archive/{year}/{month:02d}"
-            ]
-            
-            for archive_url in archive_urls:
-                try:
-                    time.sleep(2)  # Respectful delay
+            ])
+        
+        for archive_url in archive_urls:
+            try:
+                time.sleep(2)  # Respectful delay
+                
+                # Try to parse the archive feed
+                archive_feed = self._fetch_feed(archive_url)
+                
+                if len(archive_feed.entries) > 0:
+                    logger.info(f"Found archive feed: {archive_url} with {len(archive_feed.entries)} entries")
+                    archives_found += 1
                     
-                    # Try to parse the archive feed
-                    archive_feed = feedparser.parse(archive_url)
+                    # Create a temporary feed_info with the archive URL
+                    temp_feed_info = feed_info.copy()
+                    temp_feed_info["url"] = archive_url
                     
-                    if len(archive_feed.entries) > 0:
-                        logger.info(f"Found archive feed: {archive_url} with {len(archive_feed.entries)} entries")
-                        
-                        # Create a temporary feed_info with the archive URL
-                        temp_feed_info = feed_info.copy()
-                        temp_feed_info["url"] = archive_url
-                        
-                        # Scrape the archive feed
-                        articles = self.scrape_feed(temp_feed_info)
-                        all_articles.extend(articles)
-                except Exception as e:
-                    logger.debug(f"Failed to fetch archive {archive_url}: {e}")
+                    # Scrape the fetched archive feed without downloading it again
+                    articles = self.scrape_feed(temp_feed_info, track_health=False, feed=archive_feed)
+                    all_articles.extend(articles)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                # The remaining archive URLs are on the same site and would wait out the timeout too
+                logger.info(f"Stopped probing archives of {source}, site unreachable: {e}")
+                break
+            except Exception as e:
+                logger.debug(f"Failed to fetch archive {archive_url}: {e}")
         
+        self.feed_health.record_archive_probe(feed_info, archives_found)
         logger.info(f"Scraped {len(all_articles)} historical articles for {source}")
         return all_articles
 
     def save_to_database(self, articles):
-        """Save articles to SQLite database"""
+        """
+        Save articles to SQLite database, routing them to shards if sharding is enabled.
+        
+        Returns:
+            list: Articles that are stored in the database (now or from an earlier run)
+        """
         if not articles:
-            return
+            return []
 
-        conn = sqlite3.connect(self.db_file)
+        if self.manifest is None:
+            saved = self._write_articles(self.db_file, articles)
+        else:
+            # Group articles by shard; each shard has its own lock, so write them in parallel
+            shard_articles = {}
+            for article in articles:
+                key = storage.shard_key(article, self.shard_by)
+                db_file = storage.get_shard_file(self.manifest, key, self.shard_dir)
+                shard_articles.setdefault(db_file, []).append(article)
+            
+            with ThreadPoolExecutor(max_workers=min(8, len(shard_articles))) as executor:
+                saved = [article for shard_saved in executor.map(lambda item: self._write_articles(*item),
+                                                                 shard_articles.items())
+                         for article in shard_saved]
+            
+            # Publishes new shards and marks the ingest for the API server
+            storage.save_manifest(self.manifest, self.shard_dir)
+        
+        logger.info(f"Saved {len(saved)} articles to database")
+        return saved
+
+    def _write_articles(self, db_file, articles):
+        """
+        Insert articles into a single SQLite database file.
+        
+        Returns:
+            list: Articles that are stored in the file, including ones inserted earlier
+        """
+        conn = sqlite3.connect(db_file)
         c = conn.cursor()
         
+        # Large text fields are stored compressed, with a dictionary trained on the first batch
+        codec = storage.TextCodec(conn)
+        codec.train([article.content or article.summary for article in articles])
+        compressed = [column in storage.COMPRESSED_COLUMNS for column in storage.ARTICLE_COLUMNS]
+        inserted = []
+        stored = []
+        
         for article in articles:
             try:
                 c.execute('''
@@ -304,128 +423,202 @@ class RSSFeedScraper:
                     (title, publication_date, source, country, language, 
                      summary, url, content, keywords, scraped_date)
                     VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                ''', (
-                    article["title"],
-                    article["publication_date"],
-                    article["source"],
-                    article["country"],
-                    article["language"],
-                    article["summary"],
-                    article["url"],
-                    article["content"],
-                    article["keywords"],
-                    article["scraped_date"]
-                ))
+                ''', tuple(codec.encode(value) if compress else value
+                          for value, compress in zip(article.to_row(), compressed)))
+                
+                # Index the keywords of newly inserted articles
+                if c.rowcount == 1:
+                    storage.add_article_tags(conn, c.lastrowid, article.keywords)
+                    inserted.append(article)
+                stored.append(article)
             except sqlite3.Error as e:
-                logger.error(f"SQLite error: {e} for article {article['title']}")
+                logger.error(f"SQLite error: {e} for article {article.title}")
+        
+        try:
+            # Count only new articles in the trend rollups
+            trends.update_db_rollups(conn, trends.rollup_counts(inserted))
+            conn.commit()
+        except sqlite3.Error as e:
+            logger.error(f"SQLite error: {e} committing articles to {db_file}")
+            stored = []
+        finally:
+            conn.close()
         
-        conn.commit()
-        conn.close()
-        logger.info(f"Saved {len(articles)} articles to database")
+        return stored
 
     def save_to_json(self, articles, filename="data/news_data.json"):
-        """Save articles to JSON file"""
+        """
+        Save articles to JSON file.
+        
+        Returns:
+            list: Articles that are stored in the file, empty if writing failed
+        """
         if not articles:
-            return
+            return []
             
         try:
             # Read existing data if file exists
             existing_data = []
             if os.path.exists(filename):
-                with open(filename, 'r', encoding='utf-8') as file:
+                with open(filename, 'rb') as file:
                     try:
-                        existing_data = json.load(file)
-                    except json.JSONDecodeError:
+                        existing_data = article_codec.loads(file.read())
+                    except ValueError:
                         existing_data = []
             
             # Combine existing data with new articles, avoiding duplicates
             url_set = set(item["url"] for item in existing_data)
+            new_articles = []
             
             for article in articles:
-                if article["url"] not in url_set:
-                    existing_data.append(article)
-                    url_set.add(article["url"])
+                if article.url not in url_set:
+                    existing_data.append(article.to_dict())
+                    url_set.add(article.url)
+                    new_articles.append(article)
+            
+            # Update the trend rollups before publishing the data they describe
+            self._update_file_trends(new_articles, lambda: existing_data)
             
-            # Write combined data back to file
-            with open(filename, 'w', encoding='utf-8') as file:
-                json.dump(existing_data, file, ensure_ascii=False, indent=2)
+            # Write combined data back to file, publishing it atomically
+            temp_filename = filename + ".tmp"
+            with open(temp_filename, 'w', encoding='utf-8') as file:
+                file.write(article_codec.dumps(existing_data, indent=True))
+            os.replace(temp_filename, filename)
                 
             logger.info(f"Saved {len(articles)} articles to JSON file {filename}")
+            return articles
             
         except Exception as e:
             logger.error(f"Error saving to JSON: {e}")
+            return []
+
+    def _update_file_trends(self, new_articles, load_all_articles):
+        """
+        Add new articles to the trend rollups of the JSON/CSV formats.
+        
+        Args:
+            new_articles (list): Articles not saved before
+            load_all_articles (callable): Returns every saved article, used to build
+                the rollups when the trends file does not exist yet
+        """
+        if os.path.exists(trends.TRENDS_FILE):
+            trends.update_file_rollups(trends.rollup_counts(new_articles))
+        else:
+            trends.update_file_rollups(trends.rollup_counts(load_all_articles()), rebuild=True)
 
     def save_to_csv(self, articles, filename="data/news_data.csv"):
-        """Save articles to CSV file"""
+        """
+        Save articles to CSV file.
+        
+        Returns:
+            list: Articles that are stored in the file, empty if writing failed
+        """
         if not articles:
-            return
+            return []
             
         try:
             # Convert to DataFrame
-            df = pd.DataFrame(articles)
+            df = pd.DataFrame([article.to_row() for article in articles], columns=list(storage.ARTICLE_COLUMNS))
             
             # Check if file exists to append or create new
+            existing_urls = set()
             if os.path.exists(filename):
                 # Read existing CSV
                 existing_df = pd.read_csv(filename)
+                existing_urls = set(existing_df['url'])
                 
                 # Combine and remove duplicates based on URL
-                combined_df = pd.concat([existing_df, df]).drop_duplicates(subset=['url'])
-                
-                # Write back to CSV
-                combined_df.to_csv(filename, index=False, encoding='utf-8')
-            else:
-                # Create new CSV
-                df.to_csv(filename, index=False, encoding='utf-8')
+                df = pd.concat([existing_df, df]).drop_duplicates(subset=['url'])
+            
+            # Update the trend rollups before publishing the data they describe
+            new_articles = {article.url: article for article in articles if article.url not in existing_urls}
+            self._update_file_trends(list(new_articles.values()), lambda: df.to_dict('records'))
+
+            # Publish atomically so readers never see a partially written file
+            temp_filename = filename + ".tmp"
+            df.to_csv(temp_filename, index=False, encoding='utf-8')
+            os.replace(temp_filename, filename)
                 
             logger.info(f"Saved {len(articles)} articles to CSV file {filename}")
+            return articles
             
         except Exception as e:
             logger.error(f"Error saving to CSV: {e}")
+            return []
+
+    def apply_retention(self):
+        """
+        Move articles older than their retention period to the compressed archive
+        and compact the hot store.
+        
+        Returns:
+            int: Number of archived articles
+        """
+        policy = self.retention_policy
+        if not policy.is_active():
+            return 0
+        
+        if self.data_format == "db":
+            archived = sum(retention.archive_database(db_file, policy) for db_file in self._database_files())
+            if archived and self.manifest is not None:
+                # The API versions sharded data by the manifest, so publish the change
+                storage.save_manifest(self.manifest, self.shard_dir)
+            return archived
+        elif self.data_format == "json":
+            return retention.archive_json_file("data/news_data.json", policy)
+        elif self.data_format == "csv":
+            return retention.archive_csv_file("data/news_data.csv", policy)
+        return 0
 
     def generate_report(self):
         """Generate a summary report of scraped data"""
         report = {"countries": {}}
         
         if self.data_format == "db":
-            # Generate report from database
-            conn = sqlite3.connect(self.db_file)
-            cursor = conn.cursor()
+            # Generate report from database (every shard when sharded)
+            total_count = 0
             
-            # Get total count
-            cursor.execute("SELECT COUNT(*) FROM news_articles")
-            total_count = cursor.fetchone()[0]
-            
-            # Get counts by country and source
-            cursor.execute("""
-                SELECT country, source, COUNT(*) as count,
-                MIN(publication_date) as earliest_date
-                FROM news_articles
-                GROUP BY country, source
-                ORDER BY country, source
-            """)
-            
-            results = cursor.fetchall()
-            
-            for row in results:
-                country, source, count, earliest_date = row
+            for db_file in self._database_files():
+                conn = sqlite3.connect(db_file)
+                cursor = conn.cursor()
                 
-                if country not in report["countries"]:
-                    report["countries"][country] = {"total": 0, "sources": {}}
+                # Get total count
+                cursor.execute("SELECT COUNT(*) FROM news_articles")
+                total_count += cursor.fetchone()[0]
                 
-                report["countries"][country]["sources"][source] = {
-                    "count": count,
-                    "earliest_date": earliest_date
-                }
-                report["countries"][country]["total"] += count
-            
-            conn.close()
+                # Get counts by country and source
+                cursor.execute("""
+                    SELECT country, source, COUNT(*) as count,
+                    MIN(publication_date) as earliest_date
+                    FROM news_articles
+                    GROUP BY country, source
+                    ORDER BY country, source
+                """)
+                
+                results = cursor.fetchall()
+                
+                for row in results:
+                    country, source, count, earliest_date = row
+                    
+                    if country not in report["countries"]:
+                        report["countries"][country] = {"total": 0, "sources": {}}
+                    
+                    sources = report["countries"][country]["sources"]
+                    if source not in sources:
+                        sources[source] = {"count": 0, "earliest_date": earliest_date}
+                    
+                    sources[source]["count"] += count
+                    if earliest_date < sources[source]["earliest_date"]:
+                        sources[source]["earliest_date"] = earliest_date
+                    report["countries"][country]["total"] += count
+                
+                conn.close()
             
         elif self.data_format == "json":
             # Generate report from JSON file
             try:
-                with open("data/news_data.json", 'r', encoding='utf-8') as file:
-                    articles = json.load(file)
+                with open("data/news_data.json", 'rb') as file:
+                    articles = article_codec.loads(file.read())
                     
                 total_count = len(articles)
                 
@@ -484,13 +677,15 @@ class RSSFeedScraper:
             except Exception as e:
                 logger.error(f"Error generating report from CSV: {e}")
         
-        # Add total count to report
+        # Add total count and feed health to report
         report["total_articles"] = total_count
+        report["feed_health"] = self.feed_health.summary()
         
         # Save report to file
         try:
-            with open("data/report.json", 'w', encoding='utf-8') as file:
+            with open("data/report.json.tmp", 'w', encoding='utf-8') as file:
                 json.dump(report, file, ensure_ascii=False, indent=2)
+            os.replace("data/report.json.tmp", "data/report.json")
                 
             # Also create a markdown report
             self._create_markdown_report(report)
@@ -515,6 +710,16 @@ class RSSFeedScraper:
             for country, data in sorted(report["countries"].items()):
                 for source, source_data in sorted(data["sources"].items()):
                     file.write(f"| {country} | {source} | {source_data['count']} | Since {source_data['earliest_date'].split('T')[0]} |\n")
+            
+            file.write("\n## Feed Health\n\n")
+            file.write("| Source | Circuit | Consecutive Failures | Error Rate | Avg Latency (s) | Last Success | Last Error |\n")
+            file.write("|--------|---------|----------------------|------------|-----------------|--------------|------------|\n")
+            
+            for url, health in report.get("feed_health", {}).items():
+                last_error = (health['last_error'] or '').replace('|', '/').replace('\n', ' ')[:80]
+                file.write(f"| {health['source']} | {health['circuit']} | {health['consecutive_failures']} | "
+                           f"{health['error_rate']:.0%} | {health['avg_latency']} | {health['last_success'] or 'never'} | "
+                           f"{last_error} |\n")
 
     def run(self, include_historical=True):
         """
@@ -530,21 +735,35 @@ class RSSFeedScraper:
             articles = self.scrape_feed(feed_info)
             all_articles.extend(articles)
             
-            # Attempt to scrape historical data if requested
-            if include_historical:
+            # Attempt to scrape historical data if requested; broken feeds and feeds
+            # whose archives were recently probed without success are not probed again
+            if (include_historical and self.feed_health.is_healthy(feed_info)
+                    and self.feed_health.should_probe_archives(feed_info)):
                 historical_articles = self.scrape_historical_data(feed_info)
                 all_articles.extend(historical_articles)
         
+        self.feed_health.save()
+        
         # Save data according to format
+        saved = []
         if self.data_format == "db":
-            self.save_to_database(all_articles)
+            saved = self.save_to_database(all_articles)
         elif self.data_format == "json":
-            self.save_to_json(all_articles)
+            saved = self.save_to_json(all_articles)
         elif self.data_format == "csv":
-            self.save_to_csv(all_articles)
+            saved = self.save_to_csv(all_articles)
         else:
             logger.warning(f"Unknown data format: {self.data_format}")
         
+        # Only mark entries as seen once they are saved; failed writes are retried next run
+        if self.seen_index is not None:
+            saved_ids = {id(article) for article in saved}
+            self.seen_index.add_many(key for article, key in self.pending_seen_keys if id(article) in saved_ids)
+            self.pending_seen_keys = []
+        
+        # Keep the hot store bounded
+        self.apply_retention()
+        
         # Generate report
         report = self.generate_report()
         
@@ -562,11 +781,29 @@ if __name__ == "__main__":
                       help="Skip historical data scraping")
     parser.add_argument("--db-file", default="news_data.db",
                       help="SQLite database file (for db format)")
+    parser.add_argument("--shard-by", choices=storage.SHARD_SCHEMES,
+                      help="Shard the database into one file per country or month (for db format)")
+    parser.add_argument("--shard-dir", default=storage.SHARD_DIR,
+                      help=f"Directory for shard databases (default: {storage.SHARD_DIR})")
+    parser.add_argument("--retention-days", type=int,
+                      help="Archive articles older than this many days (feeds can override with retention_days)")
+    parser.add_argument("--rescan", action="store_true",
+                      help="Process every feed entry, including ones seen in earlier runs")
+    parser.add_argument("--retention-only", action="store_true",
+                      help="Only run the retention and compaction job, without scraping")
     
     args = parser.parse_args()
     
     # Run the scraper
-    scraper = RSSFeedScraper(db_file=args.db_file, data_format=args.format)
+    scraper = RSSFeedScraper(db_file=args.db_file, data_format=args.format,
+                             shard_by=args.shard_by, shard_dir=args.shard_dir,
+                             retention_days=args.retention_days, skip_seen=not args.rescan)
+    
+    if args.retention_only:
+        archived = scraper.apply_retention()
+        print(f"Archived {archived} articles to {retention.ARCHIVE_DIR}")
+        exit(0)
+    
     report = scraper.run(include_historical=not args.no_historical)
     
     print("\nScraping completed. Summary:")
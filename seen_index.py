@@ -0,0 +1,126 @@
+"""
+Persistent index of feed entries that have already been scraped.
+
+A Bloom filter answers most lookups for new entries in memory; possible hits
+are confirmed against an exact SQLite table. The filter bits are stored next
+to the table so they do not have to be rebuilt on every run.
+"""
+import math
+import sqlite3
+import hashlib
+import logging
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+SEEN_DB = 'data/seen.db'
+
+class BloomFilter:
+    def __init__(self, capacity, error_rate=0.01, bits=None):
+        """
+        Bloom filter sized for a number of keys and a false positive rate.
+
+        Args:
+            capacity (int): Expected number of keys
+            error_rate (float): Target false positive rate at capacity
+            bits (bytes): Existing filter bits to load
+        """
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.num_bits = max(8, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.num_hashes = max(1, round(self.num_bits / capacity * math.log(2)))
+        self.bits = bytearray(bits) if bits else bytearray((self.num_bits + 7) // 8)
+
+    def _positions(self, key):
+        """Bit positions of a key, derived from two halves of one hash (double hashing)"""
+        digest = hashlib.blake2b(key.encode('utf-8'), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        return [(h1 + i * h2) % self.num_bits for i in range(self.num_hashes)]
+
+    def add(self, key):
+        for position in self._positions(key):
+            self.bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, key):
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(key))
+
+class SeenIndex:
+    def __init__(self, db_file=SEEN_DB, capacity=100000, error_rate=0.01):
+        """
+        Open (or create) the seen-entry index.
+
+        Args:
+            db_file (str): SQLite file holding the exact key set and the filter bits
+            capacity (int): Initial Bloom filter capacity, doubled as the index grows
+            error_rate (float): Bloom filter false positive rate
+        """
+        self.error_rate = error_rate
+        self.conn = sqlite3.connect(db_file)
+        self.conn.execute('''
+            CREATE TABLE IF NOT EXISTS seen_entries (
+                key TEXT PRIMARY KEY,
+                first_seen TEXT
+            ) WITHOUT ROWID
+        ''')
+        self.conn.execute('''
+            CREATE TABLE IF NOT EXISTS bloom_filter (
+                id INTEGER PRIMARY KEY CHECK (id = 1),
+                capacity INTEGER,
+                error_rate REAL,
+                bits BLOB
+            )
+        ''')
+        self.conn.commit()
+
+        self.count = self.conn.execute("SELECT COUNT(*) FROM seen_entries").fetchone()[0]
+        row = self.conn.execute("SELECT capacity, error_rate, bits FROM bloom_filter").fetchone()
+
+        if row and row[0] >= self.count and row[1] == error_rate:
+            self.bloom = BloomFilter(row[0], row[1], row[2])
+        else:
+            self._rebuild(max(capacity, self.count * 2))
+
+    def _rebuild(self, capacity):
+        """Rebuild the Bloom filter from the exact key set"""
+        self.bloom = BloomFilter(capacity, self.error_rate)
+        for (key,) in self.conn.execute("SELECT key FROM seen_entries"):
+            self.bloom.add(key)
+        self._save_filter()
+        logger.info(f"Rebuilt seen-entry filter for {self.count} entries (capacity {capacity})")
+
+    def _save_filter(self):
+        """Store the Bloom filter bits and commit pending keys"""
+        self.conn.execute(
+            "INSERT OR REPLACE INTO bloom_filter (id, capacity, error_rate, bits) VALUES (1, ?, ?, ?)",
+            (self.bloom.capacity, self.bloom.error_rate, bytes(self.bloom.bits))
+        )
+        self.conn.commit()
+
+    def __contains__(self, key):
+        """Whether an entry key has been seen; the exact table confirms Bloom filter hits"""
+        if key not in self.bloom:
+            return False
+        return self.conn.execute("SELECT 1 FROM seen_entries WHERE key = ?", (key,)).fetchone() is not None
+
+    def add_many(self, keys):
+        """Record entry keys as seen"""
+        now = datetime.now().isoformat()
+        added = 0
+        for key in keys:
+            cursor = self.conn.execute(
+                "INSERT OR IGNORE INTO seen_entries (key, first_seen) VALUES (?, ?)", (key, now)
+            )
+            if cursor.rowcount:
+                self.bloom.add(key)
+                added += 1
+        self.count += added
+
+        if self.count > self.bloom.capacity:
+            # Past capacity the false positive rate climbs quickly
+            self._rebuild(self.bloom.capacity * 2)
+        else:
+            self._save_filter()
+
+    def close(self):
+        self.conn.close()
@@ -16,7 +16,11 @@ setup(
         "langdetect>=1.0.9",
         "python-dateutil>=2.8.2",
         "flask>=2.3.3",
+        "gunicorn>=21.2.0",
     ],
+    extras_require={
+        "fast": ["orjson>=3.8.0"],
+    },
     entry_points={
         "console_scripts": [
             "rss-scraper=rss_scraper:main",
@@ -0,0 +1,350 @@
+"""
+SQLite storage helpers shared by the scraper and the API server.
+
+Articles live either in a single database file or, optionally, in shards: one
+SQLite file per country or per publication month. A manifest in the shard
+directory records the sharding scheme and which shards exist so queries can be
+routed to the relevant files only.
+
+Large text columns are stored zlib-compressed with a preset dictionary trained
+on the database's own articles; TextCodec encodes and decodes them.
+"""
+import os
+import re
+import json
+import zlib
+import struct
+import sqlite3
+import trends
+from collections import Counter
+from datetime import datetime
+
+SHARD_DIR = 'data/shards'
+MANIFEST_FILE = 'manifest.json'
+SHARD_SCHEMES = ('country', 'month')
+
+ARTICLE_COLUMNS = (
+    "title", "publication_date", "source", "country", "language",
+    "summary", "url", "content", "keywords", "scraped_date"
+)
+
+# Text columns stored compressed
+COMPRESSED_COLUMNS = ("summary", "content")
+
+# Compressed values are BLOBs: magic, dictionary id (0 = none), zlib stream
+COMPRESSION_MAGIC = b"Z1"
+COMPRESSION_HEADER = struct.Struct(">2sI")
+COMPRESSION_LEVEL = 6
+# Shorter texts do not shrink enough to be worth compressing
+MIN_COMPRESS_SIZE = 64
+DICTIONARY_SIZE = 32 * 1024
+MIN_TRAINING_SAMPLES = 50
+
+def init_database(db_file):
+    """Create the news_articles schema in a SQLite database file"""
+    conn = sqlite3.connect(db_file)
+    c = conn.cursor()
+
+    # Create table if it doesn't exist
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS news_articles (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            title TEXT,
+            publication_date TEXT,
+            source TEXT,
+            country TEXT,
+            language TEXT,
+            summary TEXT,
+            url TEXT UNIQUE,
+            content TEXT,
+            keywords TEXT,
+            scraped_date TEXT
+        )
+    ''')
+
+    # Normalized feed keywords: tag names and an inverted index from tag to articles
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS tags (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT UNIQUE
+        )
+    ''')
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS article_tags (
+            tag_id INTEGER,
+            article_id INTEGER,
+            PRIMARY KEY (tag_id, article_id)
+        ) WITHOUT ROWID
+    ''')
+    c.execute("CREATE INDEX IF NOT EXISTS idx_article_tags_article ON article_tags (article_id)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_news_articles_country ON news_articles (country)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_news_articles_source ON news_articles (source)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_news_articles_language ON news_articles (language)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_news_articles_publication_date ON news_articles (publication_date)")
+
+    # Article counts per time bucket, maintained incrementally by the ingest path
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS trend_rollups (
+            bucket_size TEXT,
+            bucket_start TEXT,
+            country TEXT,
+            source TEXT,
+            language TEXT,
+            count INTEGER,
+            PRIMARY KEY (bucket_size, bucket_start, country, source, language)
+        ) WITHOUT ROWID
+    ''')
+
+    # Preset dictionaries for compressed text columns
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS compression_dicts (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            dictionary BLOB,
+            created_date TEXT
+        )
+    ''')
+
+    # WAL lets the API server keep reading while the scraper writes
+    c.execute("PRAGMA journal_mode=WAL")
+
+    # Databases created before the tag index existed get their keywords indexed once
+    if c.execute("PRAGMA user_version").fetchone()[0] < 1:
+        for article_id, keywords in c.execute("SELECT id, keywords FROM news_articles").fetchall():
+            add_article_tags(conn, article_id, keywords)
+        c.execute("PRAGMA user_version = 1")
+
+    # Databases created before the trend rollups existed get them computed once
+    if c.execute("PRAGMA user_version").fetchone()[0] < 2:
+        trends.rebuild_db_rollups(conn)
+        c.execute("PRAGMA user_version = 2")
+
+    conn.commit()
+    conn.close()
+
+def normalize_tag(keyword):
+    """Normalize a single keyword: lowercase with collapsed whitespace"""
+    return " ".join(keyword.split()).lower()
+
+def normalize_tags(keywords):
+    """Split a comma-joined keywords string into unique normalized tags"""
+    if not isinstance(keywords, str):
+        return []
+    tags = []
+    for keyword in keywords.split(","):
+        tag = normalize_tag(keyword)
+        if tag and tag not in tags:
+            tags.append(tag)
+    return tags
+
+def add_article_tags(conn, article_id, keywords):
+    """Add an article's keywords to the tag index"""
+    for tag in normalize_tags(keywords):
+        conn.execute("INSERT OR IGNORE INTO tags (name) VALUES (?)", (tag,))
+        conn.execute(
+            "INSERT OR IGNORE INTO article_tags (tag_id, article_id) "
+            "SELECT id, ? FROM tags WHERE name = ?", (article_id, tag)
+        )
+
+def shard_key(article, shard_by):
+    """Get the shard an article belongs to: its country or its YYYY-MM month"""
+    if shard_by == "country":
+        return article["country"]
+    return article["publication_date"][:7]
+
+def shard_filename(key):
+    """Turn a shard key into a safe file name"""
+    slug = re.sub(r'[^A-Za-z0-9_-]+', '_', key).strip('_') or "unknown"
+    return f"{slug}.db"
+
+def manifest_path(shard_dir=SHARD_DIR):
+    """Path of the shard manifest"""
+    return os.path.join(shard_dir, MANIFEST_FILE)
+
+def load_manifest(shard_dir=SHARD_DIR):
+    """
+    Load the shard manifest.
+
+    Returns:
+        dict: {"shard_by": ..., "shards": {key: filename}, "updated": ...} or None
+    """
+    try:
+        with open(manifest_path(shard_dir), 'r', encoding='utf-8') as file:
+            return json.load(file)
+    except FileNotFoundError:
+        return None
+
+def save_manifest(manifest, shard_dir=SHARD_DIR):
+    """Atomically write the shard manifest, stamping the time of the update"""
+    manifest["updated"] = datetime.now().isoformat()
+    path = manifest_path(shard_dir)
+    with open(path + ".tmp", 'w', encoding='utf-8') as file:
+        json.dump(manifest, file, ensure_ascii=False, indent=2)
+    os.replace(path + ".tmp", path)
+
+def new_manifest(shard_by):
+    """Create an empty manifest for a sharding scheme"""
+    if shard_by not in SHARD_SCHEMES:
+        raise ValueError(f"Unknown shard scheme: {shard_by}")
+    return {"shard_by": shard_by, "shards": {}}
+
+def get_shard_file(manifest, key, shard_dir=SHARD_DIR):
+    """
+    Get the database file for a shard key, creating the shard if it is new.
+
+    The caller is responsible for saving the manifest afterwards.
+    """
+    shards = manifest["shards"]
+    if key not in shards:
+        filename = shard_filename(key)
+        # Different keys can slugify to the same name
+        taken = set(shards.values())
+        suffix = 1
+        while filename in taken:
+            suffix += 1
+            filename = f"{shard_filename(key)[:-3]}_{suffix}.db"
+        shards[key] = filename
+        init_database(os.path.join(shard_dir, filename))
+
+    return os.path.join(shard_dir, shards[key])
+
+def shard_paths(manifest, shard_dir=SHARD_DIR, countries=None, since=None, until=None):
+    """
+    Select the shards that can hold articles matching the filters.
+
+    Args:
+        manifest (dict): Shard manifest
+        shard_dir (str): Directory containing the shards
+        countries (list): Country filter, prunes country shards
+        since (str): ISO date lower bound, prunes month shards
+        until (str): ISO date upper bound, prunes month shards
+
+    Returns:
+        list: Paths of the shard database files to query
+    """
+    shards = manifest["shards"]
+    keys = sorted(shards)
+
+    if manifest["shard_by"] == "country" and countries:
+        keys = [key for key in keys if key in countries]
+    elif manifest["shard_by"] == "month":
+        if since:
+            keys = [key for key in keys if key >= since[:7]]
+        if until:
+            keys = [key for key in keys if key <= until[:7]]
+
+    return [os.path.join(shard_dir, shards[key]) for key in keys]
+
+def all_shard_paths(shard_dir=SHARD_DIR):
+    """Paths of every shard in a shard directory"""
+    manifest = load_manifest(shard_dir)
+    if manifest is None:
+        return []
+    return shard_paths(manifest, shard_dir)
+
+def train_dictionary(texts, size=DICTIONARY_SIZE):
+    """
+    Build a zlib preset dictionary from sample texts.
+
+    The dictionary is made of the most common words and word pairs. zlib
+    favours recent bytes, so the most frequent strings go at the end.
+    """
+    counts = Counter()
+    for text in texts:
+        words = text.split()
+        counts.update(word for word in words if len(word) > 3)
+        counts.update(" ".join(pair) for pair in zip(words, words[1:]))
+
+    chosen = []
+    used = 0
+    for phrase, count in counts.most_common():
+        if count < 2 or used >= size:
+            break
+        chosen.append(phrase)
+        used += len(phrase.encode('utf-8')) + 1
+
+    return " ".join(reversed(chosen)).encode('utf-8')[-size:]
+
+class TextCodec:
+    def __init__(self, conn, dictionaries=None):
+        """
+        Compress and decompress text columns of one database.
+
+        Args:
+            conn (sqlite3.Connection): Connection to the database holding the dictionaries
+            dictionaries (dict): Dictionaries already loaded from this database, by id; filled
+                in as more are loaded, so it can be shared between codecs of the same database
+        """
+        self.conn = conn
+        self.dictionaries = dictionaries if dictionaries is not None else {}
+        self._dict_id = None
+
+    @property
+    def dict_id(self):
+        """Id of the dictionary new values are compressed with (0 if there is none yet)"""
+        if self._dict_id is None:
+            row = self.conn.execute("SELECT MAX(id) FROM compression_dicts").fetchone()
+            self._dict_id = row[0] or 0
+        return self._dict_id
+
+    def _dictionary(self, dict_id):
+        """Get a preset dictionary by id, loading it on first use"""
+        if dict_id not in self.dictionaries:
+            row = self.conn.execute("SELECT dictionary FROM compression_dicts WHERE id = ?", (dict_id,)).fetchone()
+            self.dictionaries[dict_id] = row[0]
+        return self.dictionaries[dict_id]
+
+    def train(self, texts):
+        """Train and store a dictionary if there is none yet and enough sample texts"""
+        if self.dict_id:
+            return
+
+        samples = [text for text in texts if text and len(text) >= MIN_COMPRESS_SIZE]
+        if len(samples) < MIN_TRAINING_SAMPLES:
+            return
+
+        dictionary = train_dictionary(samples)
+        if not dictionary:
+            return
+
+        cursor = self.conn.execute(
+            "INSERT INTO compression_dicts (dictionary, created_date) VALUES (?, ?)",
+            (dictionary, datetime.now().isoformat())
+        )
+        self._dict_id = cursor.lastrowid
+        self.dictionaries[self._dict_id] = dictionary
+
+    def encode(self, text):
+        """Compress a text value, or return it unchanged if compression does not pay off"""
+        if not text or len(text) < MIN_COMPRESS_SIZE:
+            return text
+
+        if self.dict_id:
+            compressor = zlib.compressobj(COMPRESSION_LEVEL, zdict=self._dictionary(self.dict_id))
+        else:
+            compressor = zlib.compressobj(COMPRESSION_LEVEL)
+        raw = text.encode('utf-8')
+        compressed = compressor.compress(raw) + compressor.flush()
+
+        if len(compressed) + COMPRESSION_HEADER.size >= len(raw):
+            return text
+        return COMPRESSION_HEADER.pack(COMPRESSION_MAGIC, self.dict_id) + compressed
+
+    def decode(self, value):
+        """Decompress a stored value; plain text is returned unchanged"""
+        if not isinstance(value, bytes) or not value.startswith(COMPRESSION_MAGIC):
+            return value
+
+        _, dict_id = COMPRESSION_HEADER.unpack_from(value)
+        if dict_id:
+            decompressor = zlib.decompressobj(zdict=self._dictionary(dict_id))
+        else:
+            decompressor = zlib.decompressobj()
+        data = decompressor.decompress(value[COMPRESSION_HEADER.size:]) + decompressor.flush()
+        return data.decode('utf-8')
+
+    def decode_article(self, article):
+        """Decompress the compressed columns of an article dict in place"""
+        for column in COMPRESSED_COLUMNS:
+            if column in article:
+                article[column] = self.decode(article[column])
+        return article
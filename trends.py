@@ -0,0 +1,100 @@
+"""
+Time-bucketed article counts for trend queries.
+
+The ingest path adds every new article to hourly, daily and weekly buckets per
+country, source and language, so trend queries read a small rollup instead of
+scanning the articles. SQLite stores keep the rollups in a trend_rollups table;
+the JSON and CSV formats keep them in data/trends.json.
+"""
+import os
+import json
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+
+TRENDS_FILE = 'data/trends.json'
+BUCKET_SIZES = ('hour', 'day', 'week')
+GROUP_FIELDS = ('country', 'source', 'language')
+
+def bucket_starts(publication_date):
+    """
+    Get the start of the hour, day and week buckets of a publication date.
+
+    Dates with a time zone are converted to UTC. Weeks start on Monday.
+
+    Returns:
+        dict: bucket size -> bucket start, or None if the date cannot be parsed
+    """
+    try:
+        parsed = datetime.fromisoformat(publication_date.replace("Z", "+00:00"))
+    except (AttributeError, ValueError):
+        return None
+
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+
+    day = parsed.date()
+    return {
+        "hour": parsed.strftime("%Y-%m-%dT%H:00:00"),
+        "day": day.isoformat(),
+        "week": (day - timedelta(days=day.weekday())).isoformat(),
+    }
+
+def rollup_counts(articles):
+    """
+    Count articles per bucket, country, source and language.
+
+    Returns:
+        Counter: (bucket_size, bucket_start, country, source, language) -> count
+    """
+    counts = Counter()
+    for article in articles:
+        starts = bucket_starts(article["publication_date"])
+        if starts is None:
+            continue
+        for bucket_size, bucket_start in starts.items():
+            counts[(bucket_size, bucket_start, article["country"], article["source"], article["language"])] += 1
+    return counts
+
+def update_db_rollups(conn, counts):
+    """Add rollup counts to the trend_rollups table of a database"""
+    conn.executemany('''
+        INSERT INTO trend_rollups (bucket_size, bucket_start, country, source, language, count)
+        VALUES (?, ?, ?, ?, ?, ?)
+        ON CONFLICT (bucket_size, bucket_start, country, source, language)
+        DO UPDATE SET count = count + excluded.count
+    ''', [key + (count,) for key, count in counts.items()])
+
+def rebuild_db_rollups(conn):
+    """Recompute the trend_rollups table from the articles in a database"""
+    conn.execute("DELETE FROM trend_rollups")
+    cursor = conn.execute("SELECT publication_date, country, source, language FROM news_articles")
+    columns = [column[0] for column in cursor.description]
+    update_db_rollups(conn, rollup_counts(dict(zip(columns, row)) for row in cursor.fetchall()))
+
+def load_file_rollups(path=TRENDS_FILE):
+    """
+    Load the rollups of the JSON/CSV formats.
+
+    Returns:
+        dict: bucket size -> {bucket start -> [[country, source, language, count], ...]}
+    """
+    with open(path, 'r', encoding='utf-8') as file:
+        return json.load(file)
+
+def update_file_rollups(counts, path=TRENDS_FILE, rebuild=False):
+    """Add rollup counts to the trends file, or replace its contents when rebuilding"""
+    totals = Counter()
+    if not rebuild and os.path.exists(path):
+        for bucket_size, buckets in load_file_rollups(path).items():
+            for bucket_start, rows in buckets.items():
+                for country, source, language, count in rows:
+                    totals[(bucket_size, bucket_start, country, source, language)] += count
+    totals.update(counts)
+
+    rollups = {bucket_size: {} for bucket_size in BUCKET_SIZES}
+    for (bucket_size, bucket_start, country, source, language), count in sorted(totals.items()):
+        rollups[bucket_size].setdefault(bucket_start, []).append([country, source, language, count])
+
+    with open(path + ".tmp", 'w', encoding='utf-8') as file:
+        json.dump(rollups, file, ensure_ascii=False)
+    os.replace(path + ".tmp", path)